@@ -1,23 +1,26 @@
+import pickle
 import neat
 import numpy as np
+from ai.compiled_net import CompiledNetwork
+from ai.encoding import NUM_INPUTS, encode_board, side_to_move, policy_scores
 
 class NEATAgent:
-    def __init__(self, genome, config, player=1):
+    def __init__(self, genome, config, player=1, net=None):
+        # net: an already built network for genome (e.g. from ai.net_cache)
         self.genome = genome
-        self.net = neat.nn.FeedForwardNetwork.create(genome, config)
+        self.net = net if net is not None else neat.nn.FeedForwardNetwork.create(genome, config)
         self.player = player
+        self._inputs = np.zeros(NUM_INPUTS, dtype=np.float32)
+
+    def policy_outputs(self, board, player):
+        # Raw policy outputs for board (Board object or np.ndarray) seen by player
+        return self.net.activate(encode_board(board, player, self._inputs))
 
     def select_move(self, board, legal_moves):
         # Support both Board object and np.ndarray
-        board_arr = getattr(board, 'board', board)
-        input_board = np.array(board_arr).flatten() / 4.0  # Normalize values
-        outputs = self.net.activate(input_board)
-        move_scores = []
-        for idx, move in enumerate(legal_moves):
-            move_score = outputs[idx] if idx < len(outputs) else -float('inf')
-            move_scores.append(move_score)
-        best_idx = int(np.argmax(move_scores))
-        return legal_moves[best_idx]
+        player = side_to_move(board, legal_moves)
+        move_scores = policy_scores(self.policy_outputs(board, player), legal_moves, player)
+        return legal_moves[int(np.argmax(move_scores))]
 
     def learn_from_experience(self, board_before, move, winner):
         # Placeholder: In NEAT, direct online learning is not standard.
@@ -27,15 +30,47 @@ class NEATAgent:
 
 
 class ValueNEATAgent:
-    def __init__(self, genome, config, player=2):
+    def __init__(self, genome, config, player=2, net=None, compiled=None):
+        # net/compiled: already built networks for genome (e.g. from ai.net_cache)
         self.genome = genome
-        self.net = neat.nn.FeedForwardNetwork.create(genome, config)
+        self.net = net if net is not None else neat.nn.FeedForwardNetwork.create(genome, config)
         self.player = player
+        # Batched evaluator for predict_values; None if the genome uses functions it cannot compile
+        if compiled is None and net is None:
+            try:
+                compiled = CompiledNetwork.create(genome, config)
+            except ValueError:
+                compiled = None
+        self.compiled = compiled
+        self._inputs = np.zeros(NUM_INPUTS, dtype=np.float32)
 
     def predict_value(self, board):
-        board_arr = getattr(board, 'board', board)
-        input_board = np.array(board_arr).flatten() / 4.0  # Normalize values
+        # Boards are encoded from this agent's player's side
+        input_board = encode_board(board, self.player, self._inputs)
         # Output is a single value between -1 and 1
         value = self.net.activate(input_board)[0]
         return value
 
+    def predict_values(self, boards):
+        # Scores many boards (Board objects or 8x8 arrays) in one batched network call
+        inputs = np.empty((len(boards), NUM_INPUTS), dtype=np.float32)
+        for i, board in enumerate(boards):
+            encode_board(board, self.player, inputs[i])
+        if self.compiled is None:
+            return np.array([self.net.activate(x)[0] for x in inputs])
+        return self.compiled.forward(inputs)[:, 0]
+
+
+def load_genome(path, config):
+    # Unpickles a saved genome. One saved under an older config (e.g. with 64 policy outputs,
+    # before moves got a slot per direction) gets the missing output nodes, unconnected and
+    # with zero bias, so it still builds; retrain to make use of them.
+    with open(path, 'rb') as f:
+        genome = pickle.load(f)
+    genome_config = config.genome_config
+    for key in genome_config.output_keys:
+        if key not in genome.nodes:
+            node = genome.create_node(genome_config, key)
+            node.bias = 0.0
+            genome.nodes[key] = node
+    return genome
@@ -0,0 +1,146 @@
+"""
+Exports a NEAT genome as a generated Python module with the network unrolled
+into straight-line code, for the lowest latency on single-position inference
+with a fixed genome (e.g. the champion loaded by the web app).
+
+Only the nodes and enabled connections that feed an output are emitted. The
+generated activate(inputs) returns the same values as
+neat.nn.FeedForwardNetwork.activate. Modules are cached on disk by a hash of
+the expressed network, so each genome is generated once:
+
+    python -m ai.codegen best_policy_genome.pkl
+"""
+import argparse
+import hashlib
+import importlib.util
+import os
+import sys
+import neat
+from ai.agent import load_genome
+
+DEFAULT_CACHE_DIR = os.path.join('analysis', 'compiled_nets')
+
+# Activation of z for each neat-python activation function, with the same scaling and clamping.
+# tanh is not clamped: tanh(x) is already exactly +-1.0 well before |x| = 60.
+ACTIVATION_EXPRESSIONS = {
+    'sigmoid': '1.0 / (1.0 + exp(-max(-60.0, min(60.0, 5.0 * z))))',
+    'tanh': 'tanh(2.5 * z)',
+    'sin': 'sin(max(-60.0, min(60.0, 5.0 * z)))',
+    'gauss': 'exp(-5.0 * max(-3.4, min(3.4, z)) ** 2)',
+    'relu': 'z if z > 0.0 else 0.0',
+    'elu': 'z if z > 0.0 else exp(z) - 1',
+    'lelu': 'z if z > 0.0 else 0.005 * z',
+    'identity': 'z',
+    'clamped': 'max(-1.0, min(1.0, z))',
+    'exp': 'exp(max(-60.0, min(60.0, z)))',
+    'abs': 'abs(z)',
+    'hat': 'max(0.0, 1 - abs(z))',
+    'square': 'z ** 2',
+    'cube': 'z ** 3',
+}
+
+
+def network_hash(genome, config):
+    # Hash of everything the generated code depends on: the expressed connections and the
+    # node genes, input and output keys
+    genome_config = config.genome_config
+    parts = [
+        ('inputs', tuple(genome_config.input_keys)),
+        ('outputs', tuple(genome_config.output_keys)),
+        ('connections', tuple(sorted(
+            (cg.key, cg.weight) for cg in genome.connections.values() if cg.enabled))),
+        ('nodes', tuple(sorted(
+            (key, ng.bias, ng.response, ng.activation, ng.aggregation) for key, ng in genome.nodes.items()))),
+    ]
+    return hashlib.sha1(repr(parts).encode()).hexdigest()
+
+
+def generate_source(genome, config):
+    # Returns the source of a module defining activate(inputs) for genome.
+    # Raises ValueError for aggregation/activation functions it cannot generate.
+    net = neat.nn.FeedForwardNetwork.create(genome, config)
+    names = {key: f'x{i}' for i, key in enumerate(net.input_nodes)}
+    body = []
+    for node, _, _, bias, response, links in net.node_evals:
+        node_gene = genome.nodes[node]
+        if node_gene.aggregation != 'sum':
+            raise ValueError(f"Unsupported aggregation '{node_gene.aggregation}' for node {node}")
+        if node_gene.activation not in ACTIVATION_EXPRESSIONS:
+            raise ValueError(f"Unsupported activation '{node_gene.activation}' for node {node}")
+        total = ' + '.join(f'{names[i]} * {w!r}' for i, w in links) or '0.0'
+        if response != 1.0:
+            total = f'{response!r} * ({total})'
+        if bias != 0.0:
+            total = f'{bias!r} + {total}'
+        names[node] = f'n{node}'
+        body.append(f'    z = {total}')
+        body.append(f'    {names[node]} = {ACTIVATION_EXPRESSIONS[node_gene.activation]}')
+    # Outputs the network never evaluates stay at 0.0, as in FeedForwardNetwork
+    outputs = ', '.join(names.get(key, '0.0') for key in net.output_nodes)
+    unpack = ', '.join(f'x{i}' for i in range(len(net.input_nodes)))
+    lines = [
+        f'# Generated by ai.codegen from genome {genome.key} '
+        f'(network {network_hash(genome, config)}); do not edit.',
+        'from math import exp, sin, tanh',
+        '',
+        f'NUM_INPUTS = {len(net.input_nodes)}',
+        f'NUM_OUTPUTS = {len(net.output_nodes)}',
+        f'NUM_NODES = {len(net.node_evals)}',
+        '',
+        '',
+        'def activate(inputs):',
+        f'    {unpack}, = inputs',
+        *body,
+        f'    return [{outputs}]',
+        '',
+    ]
+    return '\n'.join(lines)
+
+
+class GeneratedNetwork:
+    # A generated module loaded from path. activate(inputs) is a drop-in for
+    # FeedForwardNetwork.activate; pickles as its path, so worker processes re-import the file.
+    def __init__(self, path):
+        self.path = path
+        name = 'compiled_net_' + os.path.splitext(os.path.basename(path))[0]
+        spec = importlib.util.spec_from_file_location(name, path)
+        self.module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(self.module)
+        self.activate = self.module.activate
+
+    def __reduce__(self):
+        return (GeneratedNetwork, (self.path,))
+
+
+def load_network(genome, config, cache_dir=DEFAULT_CACHE_DIR):
+    # Returns the GeneratedNetwork for genome, writing its module to cache_dir on first use
+    digest = network_hash(genome, config)
+    path = os.path.abspath(os.path.join(cache_dir, f'net_{digest}.py'))
+    if not os.path.exists(path):
+        source = generate_source(genome, config)
+        os.makedirs(cache_dir, exist_ok=True)
+        # Write then rename, so concurrent processes never import a partial file
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(source)
+        os.replace(tmp_path, path)
+    return GeneratedNetwork(path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Generate a straight-line Python module for a NEAT genome')
+    parser.add_argument('genome', help='Pickled genome, e.g. best_policy_genome.pkl')
+    parser.add_argument('--config', default='neat_config.txt', help='NEAT config file')
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR, help='Directory for generated modules')
+    args = parser.parse_args(argv)
+
+    config = neat.Config(neat.DefaultGenome, neat.DefaultReproduction,
+                         neat.DefaultSpeciesSet, neat.DefaultStagnation, args.config)
+    genome = load_genome(args.genome, config)
+    net = load_network(genome, config, args.cache_dir)
+    print(f'{net.path}: {net.module.NUM_NODES} nodes')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,99 @@
+import neat
+import numpy as np
+
+
+# NumPy versions of the neat-python activation functions, matching their input scaling and clamping
+def _tanh(z):
+    return np.tanh(np.clip(2.5 * z, -60.0, 60.0))
+
+
+def _sigmoid(z):
+    return 1.0 / (1.0 + np.exp(-np.clip(5.0 * z, -60.0, 60.0)))
+
+
+ACTIVATIONS = {
+    'tanh': _tanh,
+    'sigmoid': _sigmoid,
+    'relu': lambda z: np.maximum(z, 0.0),
+    'identity': lambda z: z,
+    'clamped': lambda z: np.clip(z, -1.0, 1.0),
+    'abs': np.abs,
+    'square': np.square,
+    'sin': lambda z: np.sin(np.clip(5.0 * z, -60.0, 60.0)),
+    'gauss': lambda z: np.exp(-5.0 * np.clip(z, -3.4, 3.4) ** 2),
+}
+
+
+class CompiledNetwork:
+    # A feed-forward NEAT network compiled into one dense float32 matrix per layer.
+    # forward() evaluates a whole (B, num_inputs) batch with one matmul per layer and
+    # matches neat.nn.FeedForwardNetwork.activate to float32 precision.
+    def __init__(self, num_inputs, num_nodes, layers, output_columns):
+        self.num_inputs = num_inputs
+        self.num_nodes = num_nodes
+        self.layers = layers
+        self.output_columns = output_columns
+
+    @staticmethod
+    def create(genome, config):
+        # Compiles the same node set neat.nn.FeedForwardNetwork.create would evaluate.
+        # Raises ValueError for aggregation/activation functions without a NumPy version.
+        net = neat.nn.FeedForwardNetwork.create(genome, config)
+        input_keys = list(net.input_nodes)
+        columns = {key: i for i, key in enumerate(input_keys)}
+        depth = {key: 0 for key in input_keys}
+        by_depth = {}
+        for node, _, _, bias, response, links in net.node_evals:
+            node_gene = genome.nodes[node]
+            if node_gene.aggregation != 'sum':
+                raise ValueError(f"Unsupported aggregation '{node_gene.aggregation}' for node {node}")
+            if node_gene.activation not in ACTIVATIONS:
+                raise ValueError(f"Unsupported activation '{node_gene.activation}' for node {node}")
+            columns[node] = len(columns)
+            depth[node] = 1 + max((depth[i] for i, _ in links), default=0)
+            by_depth.setdefault(depth[node], []).append((node, node_gene.activation, bias, response, links))
+
+        # Outputs the network never evaluates stay at 0.0, as in FeedForwardNetwork
+        zero_column = len(columns)
+        num_nodes = zero_column + 1
+        layers = []
+        for d in sorted(by_depth):
+            nodes = by_depth[d]
+            sources = sorted({columns[i] for _, _, _, _, links in nodes for i, _ in links})
+            if not sources:
+                sources = [zero_column]
+            src_pos = {col: k for k, col in enumerate(sources)}
+            weights = np.zeros((len(sources), len(nodes)), dtype=np.float32)
+            for j, (_, _, _, _, links) in enumerate(nodes):
+                for i, w in links:
+                    weights[src_pos[columns[i]], j] += w
+            bias = np.array([n[2] for n in nodes], dtype=np.float32)
+            response = np.array([n[3] for n in nodes], dtype=np.float32)
+            targets = np.array([columns[n[0]] for n in nodes])
+            # Split by activation so each group is one vectorised call
+            groups = {}
+            for j, n in enumerate(nodes):
+                groups.setdefault(n[1], []).append(j)
+            activations = [(name, np.array(idx)) for name, idx in groups.items()]
+            layers.append((np.array(sources), weights, bias, response, targets, activations))
+        output_columns = np.array([columns.get(key, zero_column) for key in net.output_nodes])
+        return CompiledNetwork(len(input_keys), num_nodes, layers, output_columns)
+
+    def forward(self, batch):
+        # batch: (B, num_inputs) array-like; returns (B, num_outputs) float32
+        batch = np.asarray(batch, dtype=np.float32)
+        if batch.ndim != 2 or batch.shape[1] != self.num_inputs:
+            raise ValueError(f"Expected a (B, {self.num_inputs}) batch, got shape {batch.shape}")
+        values = np.zeros((batch.shape[0], self.num_nodes), dtype=np.float32)
+        values[:, :self.num_inputs] = batch
+        for sources, weights, bias, response, targets, activations in self.layers:
+            z = bias + response * (values[:, sources] @ weights)
+            out = np.empty_like(z)
+            for name, idx in activations:
+                out[:, idx] = ACTIVATIONS[name](z[:, idx])
+            values[:, targets] = out
+        return values[:, self.output_columns]
+
+    def activate(self, inputs):
+        # Single-input drop-in for neat.nn.FeedForwardNetwork.activate
+        return self.forward(np.asarray(inputs, dtype=np.float32).reshape(1, -1))[0].tolist()
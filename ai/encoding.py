@@ -0,0 +1,116 @@
+import numpy as np
+from checkers.board import Board, RC_TO_SQUARE, SQUARE_ROWS, SQUARE_COLS
+
+# Network inputs: the 32 playable squares seen by one player, twice over. Inputs 0-31 hold that
+# player's pieces and 32-63 the opponent's (0.5 for a man, 1.0 for a king). Player 2 sees the
+# board rotated 180 degrees (square s becomes 31 - s), so both sides "move up" in their inputs.
+NUM_INPUTS = 64
+
+# Policy outputs: one slot per (from square, direction of the first step or hop) in the mover's
+# view, slot = 4 * square + 2 * (1 if the step goes backward) + (1 if it goes right). Jump chains
+# that start with the same hop share a slot; policy_scores ranks them explicitly.
+NUM_POLICY_SLOTS = 128
+
+# Score gap between jump chains sharing a slot, ranked by pieces taken, then generation order
+_CHAIN_TIE_STEP = 1e-6
+
+# Inputs for 8 consecutive squares, indexed by (occupied byte | king byte << 8), in square order
+# and reversed (for player 2's rotated view)
+_BYTE_INPUTS = np.zeros((1 << 16, 8), dtype=np.float32)
+for _bit in range(8):
+    _occupied = (np.arange(1 << 16) >> _bit) & 1
+    _king = (np.arange(1 << 16) >> (_bit + 8)) & 1
+    _BYTE_INPUTS[:, _bit] = 0.5 * _occupied + 0.5 * (_occupied & _king)
+_BYTE_INPUTS_REVERSED = np.ascontiguousarray(_BYTE_INPUTS[:, ::-1])
+
+# Input per piece value for the pieces of each player, for 8x8 array boards
+_PIECE_INPUTS = {
+    1: np.array([0.0, 0.5, 0.0, 1.0, 0.0], dtype=np.float32),
+    2: np.array([0.0, 0.0, 0.5, 0.0, 1.0], dtype=np.float32),
+}
+_DARK_INDEX = SQUARE_ROWS * 8 + SQUARE_COLS
+
+
+def _byte_indices(own, kings):
+    # Table rows for the 4 bytes (8 squares each) of a player's bitboard
+    own_kings = own & kings
+    return [(own >> shift) & 255 | ((own_kings >> shift) & 255) << 8 for shift in (0, 8, 16, 24)]
+
+
+def encode_board(board, player, out=None):
+    # Writes the inputs for board (a Board or 8x8 array) seen by player into out, a contiguous
+    # float32 array of NUM_INPUTS (e.g. a preallocated buffer or a row of a batch), and returns it
+    if out is None:
+        out = np.empty(NUM_INPUTS, dtype=np.float32)
+    if isinstance(board, Board):
+        own = _byte_indices(board.pieces[player], board.kings)
+        opp = _byte_indices(board.pieces[3 - player], board.kings)
+        if player == 1:
+            np.take(_BYTE_INPUTS, own + opp, axis=0, out=out.reshape(8, 8))
+        else:
+            np.take(_BYTE_INPUTS_REVERSED, own[::-1] + opp[::-1], axis=0, out=out.reshape(8, 8))
+    else:
+        squares = np.asarray(board).reshape(64)[_DARK_INDEX]
+        if player == 1:
+            own_plane, opp_plane = out[:32], out[32:]
+        else:
+            own_plane, opp_plane = out[31::-1], out[63:31:-1]
+        own_plane[:] = _PIECE_INPUTS[player][squares]
+        opp_plane[:] = _PIECE_INPUTS[3 - player][squares]
+    return out
+
+
+def side_to_move(board, legal_moves):
+    # The side to move owns the piece on the first legal move's origin square
+    fr, fc = legal_moves[0][0], legal_moves[0][1]
+    piece = board.get_piece(fr, fc) if isinstance(board, Board) else board[fr][fc]
+    return 2 - piece % 2
+
+
+def policy_slot(move, player):
+    fr, fc = move[0], move[1]
+    captures = move[4] if len(move) > 4 else None
+    # A jump's first hop heads toward the first captured piece
+    tr, tc = captures[0] if captures else (move[2], move[3])
+    square = RC_TO_SQUARE[fr][fc]
+    # Player 1 moves up the board (toward row 0); player 2's view is rotated 180 degrees
+    backward = tr > fr
+    right = tc > fc
+    if player == 2:
+        return 4 * (31 - square) + 2 * (not backward) + (not right)
+    return 4 * square + 2 * backward + right
+
+
+def policy_slots(moves, player):
+    return np.array([policy_slot(move, player) for move in moves], dtype=np.intp)
+
+
+def _ranked_scores(outputs, moves, player):
+    # (slots, scores) of moves. Moves sharing a slot get its output less _CHAIN_TIE_STEP per
+    # rank: the chain taking the most pieces first, then the first generated.
+    slots = policy_slots(moves, player)
+    scores = np.asarray(outputs, dtype=np.float64)[slots]
+    if len(moves) > 1 and len(np.unique(slots)) < len(slots):
+        taken = np.array([len(move[4]) if len(move) > 4 else 0 for move in moves])
+        order = np.lexsort((np.arange(len(moves)), -taken, slots))
+        sorted_slots = slots[order]
+        starts = np.r_[0, np.flatnonzero(np.diff(sorted_slots)) + 1]
+        group_start = np.repeat(starts, np.diff(np.r_[starts, len(slots)]))
+        scores[order] -= _CHAIN_TIE_STEP * (np.arange(len(slots)) - group_start)
+    return slots, scores
+
+
+def policy_scores(outputs, moves, player):
+    # Gathers each move's policy output from one network evaluation; no two moves sharing a
+    # slot tie
+    return _ranked_scores(outputs, moves, player)[1]
+
+
+def policy_priors(outputs, moves, player):
+    # Softmax over the slots of the moves, each slot's probability split between the moves
+    # sharing it
+    slots, scores = _ranked_scores(outputs, moves, player)
+    exp_scores = np.exp(scores - np.max(scores))
+    _, inverse, counts = np.unique(slots, return_inverse=True, return_counts=True)
+    exp_scores /= counts[inverse]
+    return exp_scores / np.sum(exp_scores)
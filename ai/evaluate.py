@@ -8,21 +8,46 @@ import concurrent.futures
 import itertools
 
 def _play_game(args):
-    (policy_id, policy_genome_data, value_id, value_genome_data, config_policy, config_value, 
-     opp_policy_data, opp_value_data, hall_of_fame, max_moves, mcts_simulations) = args
-    from ai.agent import NEATAgent, ValueNEATAgent
+    (policy_id, policy_genome_data, value_id, config_policy, config_value,
+     opp_policy_data, opp_value_data, max_moves, lookahead_opponents,
+     minimax_depth, tablebase_path, opening_book_path) = args
+    from ai.agent import NEATAgent
+    from ai.net_cache import get_network_cache
     from ai.random_agent import RandomAgent
+    from checkers.board import get_move_cache
     from checkers.game import CheckersGame
     import numpy as np
-    
-    # Load genomes and create agents
-    policy_genome = pickle.loads(policy_genome_data)
-    value_genome = pickle.loads(value_genome_data)
+
+    # Genomes and their networks come from the worker's cache; opponent data is (genome key, pickled genome)
+    cache = get_network_cache()
+    cache_before = (cache.hits, cache.misses)
+    move_cache = get_move_cache()
+    move_cache_before = (move_cache.hits, move_cache.misses) if move_cache is not None else (0, 0)
+    policy_genome, policy_net = cache.get_policy(policy_id, policy_genome_data, config_policy)
+    # Games reaching a tablebase position are decided by it instead of played out
+    tablebase = None
+    if tablebase_path is not None:
+        from ai.tablebase import load_tablebase
+        tablebase = load_tablebase(tablebase_path)
     
     # Set up opponent agents
-    if opp_policy_data is not None:
-        opp_policy = pickle.loads(opp_policy_data)
-        agent2 = NEATAgent(opp_policy, config_policy, player=2)
+    if minimax_depth:
+        # Fixed-depth alpha-beta on material: the same strong baseline for every genome,
+        # playing the opening book's moves while the game is in it
+        from ai.minimax_agent import MinimaxAgent
+        opening_book = None
+        if opening_book_path is not None:
+            from ai.opening_book import load_opening_book
+            opening_book = load_opening_book(opening_book_path)
+        agent2 = MinimaxAgent(player=2, depth=minimax_depth, tablebase=tablebase, opening_book=opening_book)
+    elif lookahead_opponents and opp_value_data is not None:
+        # Hall-of-fame value network choosing moves by batched one-ply lookahead
+        from ai.lookahead_agent import ValueLookaheadAgent
+        opp_value, opp_net, opp_compiled = cache.get_value(*opp_value_data, config_value)
+        agent2 = ValueLookaheadAgent(opp_value, config_value, player=2, net=opp_net, compiled=opp_compiled)
+    elif opp_policy_data is not None:
+        opp_policy, opp_net = cache.get_policy(*opp_policy_data, config_policy)
+        agent2 = NEATAgent(opp_policy, config_policy, player=2, net=opp_net)
     else:
         # Use a mix of RandomAgent and GreedyAgent for more diverse opponents
         import random
@@ -37,21 +62,15 @@ def _play_game(args):
                 from ai.random_agent import RandomAgent
                 agent2 = RandomAgent(player=2)
         
-    if opp_value_data is not None:
-        opp_value = pickle.loads(opp_value_data)
-        value2 = ValueNEATAgent(opp_value, config_value, player=2)
-    else:
-        value2 = None
-        
-    agent1 = NEATAgent(policy_genome, config_policy, player=1)
-    value1 = ValueNEATAgent(value_genome, config_value, player=1)
+    agent1 = NEATAgent(policy_genome, config_policy, player=1, net=policy_net)
     
     # Initialize metrics
     fitness1 = 0
-    move_history = set()  # Track board states for repetition detection
+    move_history = set()  # Track position hashes for repetition detection
     
-    # Play two games (swapping sides)
+    # Play two games (swapping sides); fitness1 scores the genome's side, me
     for swap in range(2):
+        me = 1 + swap
         game = CheckersGame()
         done = False
         move_count = 0
@@ -59,18 +78,20 @@ def _play_game(args):
         repeated_positions = 0
         good_move_count = 0
         max_piece_advantage = 0
+        adjudicated = None  # Winner from the tablebase (0 for a draw)
+        remaining_plies = 0
         
         while not done and move_count < max_moves:
-            # Track board states for repetition detection
-            board_state = str(game.board.board)
+            # Track positions for repetition detection
+            board_state = game.hash
             if board_state in move_history:
                 repeated_positions += 1
             else:
                 move_history.add(board_state)
             
             # Get piece counts before move
-            prev_pieces_2 = int((game.board.board == 2).sum() + (game.board.board == 4).sum())
-            prev_pieces_1 = int((game.board.board == 1).sum() + (game.board.board == 3).sum())
+            prev_pieces_opp = game.board.count_pieces(3 - me)
+            prev_pieces_me = game.board.count_pieces(me)
             
             # Get and make move
             legal_moves = game.get_legal_moves()
@@ -79,45 +100,53 @@ def _play_game(args):
                 
             current_player = game.current_player
             if current_player == 1:
-                move = agent1.select_move(game.board.board, legal_moves)
+                move = agent1.select_move(game.board, legal_moves)
             else:
-                move = agent2.select_move(game.board.board, legal_moves)
+                move = agent2.select_move(game.board, legal_moves)
                 
             if move:
                 # Reward for making a non-losing move
-                if current_player == 1:
+                if current_player == me:
                     good_move_count += 1
                     
                 game.make_move(move)
                 
             done = game.is_game_over()
+            if not done and tablebase is not None:
+                known = tablebase.probe(game.board, game.current_player)
+                if known is not None:
+                    result = known[0]
+                    adjudicated = 0 if result == 0 else (game.current_player if result > 0 else 3 - game.current_player)
+                    # Score the game as if played out: a tablebase win takes its distance in plies
+                    remaining_plies = known[1]
+                    done = True
             move_count += 1
             
             # Calculate piece advantage
-            curr_pieces_2 = int((game.board.board == 2).sum() + (game.board.board == 4).sum())
-            curr_pieces_1 = int((game.board.board == 1).sum() + (game.board.board == 3).sum())
-            piece_advantage = curr_pieces_1 - curr_pieces_2
+            curr_pieces_opp = game.board.count_pieces(3 - me)
+            curr_pieces_me = game.board.count_pieces(me)
+            piece_advantage = curr_pieces_me - curr_pieces_opp
             max_piece_advantage = max(max_piece_advantage, piece_advantage)
             
             # Reward for capturing pieces
-            if current_player == 1:
-                if curr_pieces_2 < prev_pieces_2:
+            if current_player == me:
+                if curr_pieces_opp < prev_pieces_opp:
                     fitness1 += 0.2  # Increased reward for captures
-                if curr_pieces_1 < prev_pieces_1:
+                if curr_pieces_me < prev_pieces_me:
                     fitness1 -= 0.3  # Penalty for losing pieces
         
         # Game over rewards
-        my_pieces = int((game.board.board == 1).sum() + (game.board.board == 3).sum())
-        opp_pieces = int((game.board.board == 2).sum() + (game.board.board == 4).sum())
+        my_pieces = game.board.count_pieces(me)
+        opp_pieces = game.board.count_pieces(3 - me)
         piece_advantage = my_pieces - opp_pieces
         
-        winner = game.get_winner()
-        if winner == 1:
+        winner = adjudicated if adjudicated is not None else game.get_winner()
+        if winner == me:
             # Reward based on margin of victory and game length
             margin_bonus = 0.1 * piece_advantage
-            speed_bonus = 0.05 * (max_moves - move_count)  # Faster wins get a small bonus
+            speed_bonus = 0.05 * max(0, max_moves - move_count - remaining_plies)  # Faster wins get a small bonus
             fitness1 += 10 + margin_bonus + speed_bonus
-        elif winner == 2:
+        elif winner == 3 - me:
             fitness1 -= 5
         else:  # Draw
             # Small penalty for draws, but less than losing
@@ -134,115 +163,59 @@ def _play_game(args):
         
         # Swap sides for next game
         agent1, agent2 = agent2, agent1
-        value1, value2 = value2, value1
-        
-    return (policy_id, value_id, max(0, fitness1))  # Ensure non-negative fitness
 
-def evaluate_selfplay(policy_population, value_population, config_policy, config_value, hall_of_fame, games_per_genome=3, mcts_simulations=50, max_moves=100, executor=None):
+    # Cache hits/misses during this task, summed per generation by evaluate_selfplay
+    move_cache_after = (move_cache.hits, move_cache.misses) if move_cache is not None else (0, 0)
+    cache_stats = (cache.hits - cache_before[0], cache.misses - cache_before[1],
+                   move_cache_after[0] - move_cache_before[0], move_cache_after[1] - move_cache_before[1])
+    return (policy_id, value_id, max(0, fitness1), cache_stats)  # Ensure non-negative fitness
+
+def evaluate_selfplay(policy_population, value_population, config_policy, config_value, hall_of_fame, games_per_genome=3, mcts_simulations=50, max_moves=100, executor=None, lookahead_opponents=False, minimax_depth=None, tablebase_path=None, opening_book_path=None):
     import pickle
     # Reset fitness
     for genome in policy_population.values():
         genome.fitness = 0
     for genome in value_population.values():
         genome.fitness = 0
-    # Prepare all matchups
+    # Prepare all matchups; each genome is pickled once, and opponents travel as (genome key, data)
     tasks = []
+    opponents = hall_of_fame[:] if hall_of_fame else [(None, None)]
+    if minimax_depth:
+        # The minimax baseline (its opening book moves included) and the genome's own play are
+        # both deterministic, so one game pair per genome is all there is to play
+        opponents = [(None, None)]
+        games_per_genome = 1
+    elif lookahead_opponents and hall_of_fame:
+        # Likewise for value-lookahead opponents: one game pair per hall-of-fame entry
+        games_per_genome = 1
+    opponent_data = [
+        tuple((genome.key, pickle.dumps(genome)) if genome else None for genome in pair)
+        for pair in opponents
+    ]
+    # The value genome only plays through its fitness share, so tasks carry just its key
     for policy_id, policy_genome in policy_population.items():
-        for value_id, value_genome in value_population.items():
-            opponents = hall_of_fame[:] if hall_of_fame else [(None, None)]
-            for opp_policy, opp_value in opponents:
+        policy_data = pickle.dumps(policy_genome)
+        for value_id in value_population:
+            for opp_data in opponent_data:
                 for _ in range(games_per_genome):
-                    tasks.append((policy_id, pickle.dumps(policy_genome), value_id, pickle.dumps(value_genome), config_policy, config_value, pickle.dumps(opp_policy) if opp_policy else None, pickle.dumps(opp_value) if opp_value else None, hall_of_fame, max_moves, mcts_simulations))
+                    tasks.append((policy_id, policy_data, value_id, config_policy, config_value, opp_data[0], opp_data[1], max_moves, lookahead_opponents, minimax_depth, tablebase_path, opening_book_path))
     # Parallel evaluation
     if executor is not None:
         results = list(executor.map(_play_game, tasks))
     else:
         results = list(map(_play_game, tasks))
     # Aggregate fitness
-    for policy_id, value_id, fitness1 in results:
+    cache_totals = [0, 0, 0, 0]
+    for policy_id, value_id, fitness1, cache_stats in results:
         policy_population[policy_id].fitness += fitness1
         value_population[value_id].fitness += fitness1
-    # Ensure all genomes have numeric fitness
-    for genome in policy_population.values():
-        if genome.fitness is None:
-            genome.fitness = 0.0
-    for genome in value_population.values():
-        if genome.fitness is None:
-            genome.fitness = 0.0
-
-    from ai.agent import NEATAgent, ValueNEATAgent
-    from ai.random_agent import RandomAgent
-    from checkers.game import CheckersGame
-    import numpy as np
-    # Reset fitness
-    for genome in policy_population.values():
-        genome.fitness = 0
-    for genome in value_population.values():
-        genome.fitness = 0
-    # Evaluate each policy-value pair
-    for policy_idx, (policy_id, policy_genome) in enumerate(policy_population.items()):
-        for value_idx, (value_id, value_genome) in enumerate(value_population.items()):
-            print(f"Evaluating Policy {policy_idx+1}/{len(policy_population)} vs Value {value_idx+1}/{len(value_population)}")
-            agent1 = NEATAgent(policy_genome, config_policy, player=1)
-            value1 = ValueNEATAgent(value_genome, config_value, player=1)
-            # Play against a sample from hall of fame or random
-            opponents = hall_of_fame[:] if hall_of_fame else [(None, None)]
-            for opp_policy, opp_value in opponents:
-                if opp_policy is not None and opp_value is not None:
-                    agent2 = NEATAgent(opp_policy, config_policy, player=2)
-                    value2 = ValueNEATAgent(opp_value, config_value, player=2)
-                else:
-                    agent2 = RandomAgent(player=2)
-                    value2 = None
-                # Play two games (swap sides)
-                for swap in range(2):
-                    print(f"  Game swap {swap+1}/2 vs opponent {opponents.index((opp_policy, opp_value))+1}/{len(opponents)}")
-                    game = CheckersGame()
-                    fitness1 = 0
-                    fitness2 = 0
-                    done = False
-                    move_count = 0
-                    game.reset()
-                    while not done and move_count < max_moves:
-                        prev_pieces_2 = int((game.board.board == 2).sum() + (game.board.board == 4).sum())
-                        prev_pieces_1 = int((game.board.board == 1).sum() + (game.board.board == 3).sum())
-                        legal_moves = game.get_legal_moves()
-                        if not legal_moves:
-                            break
-                        if game.current_player == 1:
-                            move = agent1.select_move(game.board.board, legal_moves)
-                        else:
-                            move = agent2.select_move(game.board.board, legal_moves)
-                        if move:
-                            game.make_move(move)
-                        done = game.is_game_over()
-                        move_count += 1
-                        # Reward for surviving a move
-                        fitness1 += 0.005 if game.current_player == 2 else 0
-                        fitness2 += 0.005 if game.current_player == 1 else 0
-                        # Reward for capturing a piece
-                        curr_pieces_2 = int((game.board.board == 2).sum() + (game.board.board == 4).sum())
-                        curr_pieces_1 = int((game.board.board == 1).sum() + (game.board.board == 3).sum())
-                        if curr_pieces_2 < prev_pieces_2:
-                            fitness1 += 0.1
-                        if curr_pieces_1 < prev_pieces_1:
-                            fitness2 += 0.1
-                    # Piece advantage at end
-                    my_pieces = int((game.board.board == 1).sum() + (game.board.board == 3).sum())
-                    opp_pieces = int((game.board.board == 2).sum() + (game.board.board == 4).sum())
-                    fitness1 += 0.1 * (my_pieces - opp_pieces)
-                    winner = game.get_winner()
-                    if winner == 1:
-                        fitness1 += 1
-                    elif winner == 2:
-                        fitness1 -= 1
-                    # Assign fitness
-                    policy_genome.fitness += fitness1
-                    value_genome.fitness += fitness1
-                    # Swap sides for next game
-                    agent1, agent2 = agent2, agent1
-                    value1, value2 = value2, value1
-
+        cache_totals = [total + n for total, n in zip(cache_totals, cache_stats)]
+    net_hits, net_misses, move_hits, move_misses = cache_totals
+    print(f"Network cache: {net_hits} hits, {net_misses} builds"
+          f" ({net_hits / max(1, net_hits + net_misses):.1%} hit rate)")
+    if move_hits + move_misses:
+        print(f"Move cache: {move_hits} hits, {move_misses} misses"
+              f" ({move_hits / (move_hits + move_misses):.1%} hit rate)")
     # Ensure all genomes have numeric fitness
     for genome in policy_population.values():
         if genome.fitness is None:
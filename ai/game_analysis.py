@@ -94,10 +94,7 @@ class GameAnalyzer:
         if not self.value_agent:
             return 0.0
             
-        # Normalize board for neural network
-        board_array = np.array(board).flatten() / 4.0
-        evaluation = self.value_agent.net.activate(board_array)[0]
-        return evaluation
+        return self.value_agent.predict_value(board)
         
     def track_performance(self, agent_name, result, metrics=None):
         """Track agent performance over time."""
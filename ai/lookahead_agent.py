@@ -0,0 +1,61 @@
+import numpy as np
+from ai.agent import ValueNEATAgent
+from ai.encoding import side_to_move
+from checkers.board import Board
+
+
+class ValueLookaheadAgent:
+    # Chooses moves with the value network: every position `depth` plies ahead is scored in
+    # one batched predict_values call and the scores are backed up by minimax.
+    # Uses the same select_move(board, legal_moves) interface as NEATAgent.
+    def __init__(self, genome, config, player=1, depth=1, net=None, compiled=None):
+        self.value_agent = ValueNEATAgent(genome, config, player=player, net=net, compiled=compiled)
+        self.player = player
+        self.depth = max(1, depth)
+
+    def select_move(self, board, legal_moves):
+        if not legal_moves:
+            return None
+        if isinstance(board, Board):
+            board = board.copy()
+        else:
+            arr = board
+            board = Board()
+            board.board = arr
+        mover = side_to_move(board, legal_moves)
+
+        leaves = []
+        children = [self._expand(board, move, 3 - mover, self.depth - 1, leaves) for move in legal_moves]
+        values = self.value_agent.predict_values(leaves) if leaves else np.zeros(0)
+        # Network values are from the value agent's player's view; back up from player 1's view
+        if self.value_agent.player != 1:
+            values = -values
+        scores = [self._backup(child, values) for child in children]
+        if mover == 2:
+            scores = [-s for s in scores]
+        return legal_moves[int(np.argmax(scores))]
+
+    def _expand(self, board, move, player, depth, leaves):
+        # Plays move on board and returns the subtree below it: a leaf index into leaves,
+        # a terminal score, or (player to move, [subtrees])
+        undo = board.apply_move(move)
+        replies = board.get_legal_moves(player)
+        if not replies:
+            # The side to move has lost
+            node = ('terminal', -1.0 if player == 1 else 1.0)
+        elif depth == 0:
+            node = ('leaf', len(leaves))
+            leaves.append(board.copy())
+        else:
+            node = ('node', player, [self._expand(board, reply, 3 - player, depth - 1, leaves) for reply in replies])
+        board.undo_move(undo)
+        return node
+
+    def _backup(self, node, values):
+        kind = node[0]
+        if kind == 'terminal':
+            return node[1]
+        if kind == 'leaf':
+            return float(values[node[1]])
+        scores = [self._backup(child, values) for child in node[2]]
+        return max(scores) if node[1] == 1 else min(scores)
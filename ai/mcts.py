@@ -1,117 +1,498 @@
-import copy
+import math
 import random
+import time
 import numpy as np
+from ai.encoding import policy_priors
+from ai.rollout import RolloutEngine
+
+ROOT = 0
+
+
+class MCTSTree:
+    # Search tree stored as parallel arrays indexed by node, grown by doubling.
+    # A node's children sit in one contiguous block [first_child, first_child + num_children),
+    # allocated when the node is first expanded. Nodes keep only the move that led to them;
+    # the search replays moves on a single game object with make_move/unmake_move.
+    #
+    # num_children is -1 until the node is expanded and 0 for a terminal position.
+    # Children are visited for the first time in block order (num_expanded of them so far),
+    # so the block is laid out in expansion order. value is the sum of rewards from the view
+    # of the player who made the move into the node; player is the side to move at the node.
+    #
+    # With a transposition table, a child whose position is already in the tree is aliased to
+    # that node: canonical[child] points at the node holding the shared statistics (otherwise
+    # canonical[i] == i), and the search continues from there.
+    def __init__(self, capacity=1024, table=None):
+        self.size = 0
+        self.table = table
+        self.visits = np.zeros(capacity, dtype=np.int32)
+        self.value = np.zeros(capacity, dtype=np.float64)
+        self.prior = np.zeros(capacity, dtype=np.float32)
+        self.parent = np.full(capacity, -1, dtype=np.int32)
+        self.first_child = np.full(capacity, -1, dtype=np.int32)
+        self.num_children = np.full(capacity, -1, dtype=np.int16)
+        self.num_expanded = np.zeros(capacity, dtype=np.int16)
+        self.player = np.zeros(capacity, dtype=np.int8)
+        self.hash = np.zeros(capacity, dtype=np.uint64)
+        self.canonical = np.arange(capacity, dtype=np.int32)
+        self.moves = [None] * capacity
+
+    @classmethod
+    def from_game(cls, game, capacity=1024, table=None):
+        tree = cls(capacity, table)
+        tree.size = 1
+        tree.player[ROOT] = game.current_player
+        tree.hash[ROOT] = game.hash
+        if table is not None:
+            table.store(game.hash, ROOT, tree)
+        return tree
+
+    def _reserve(self, count):
+        capacity = len(self.visits)
+        if self.size + count <= capacity:
+            return
+        new_capacity = max(2 * capacity, self.size + count)
+        for name, fill in (('visits', 0), ('value', 0), ('prior', 0), ('parent', -1), ('first_child', -1),
+                           ('num_children', -1), ('num_expanded', 0), ('player', 0), ('hash', 0)):
+            old = getattr(self, name)
+            new = np.full(new_capacity, fill, dtype=old.dtype)
+            new[:capacity] = old
+            setattr(self, name, new)
+        canonical = np.arange(new_capacity, dtype=np.int32)
+        canonical[:capacity] = self.canonical
+        self.canonical = canonical
+        self.moves.extend([None] * (new_capacity - capacity))
+
+    def add_children(self, node, moves, priors=None):
+        # Allocates the child block of node, one child per move in the given order
+        count = len(moves)
+        self._reserve(count)
+        first = self.size
+        block = slice(first, first + count)
+        self.parent[block] = node
+        self.player[block] = 3 - self.player[node]
+        if priors is not None:
+            self.prior[block] = priors
+        self.moves[block] = moves
+        self.first_child[node] = first
+        self.num_children[node] = count
+        self.size += count
+        return first
+
+    def children(self, node):
+        first = self.first_child[node]
+        return range(first, first + self.num_children[node]) if first >= 0 else range(0)
+
+    def child_stats(self, node):
+        # (children, statistics index of each child) for node's child block
+        first = int(self.first_child[node])
+        end = first + int(self.num_children[node]) if first >= 0 else first
+        return range(first, end), (self.canonical[first:end] if self.table is not None else slice(first, end))
+
+    def best_child(self, node, c_param=1.4):
+        # UCB1 over the child block in one vectorized pass; returns the child slot
+        children, stats = self.child_stats(node)
+        visits = self.visits[stats] + 1e-6
+        scores = self.value[stats] / visits
+        scores += c_param * math.sqrt(math.log(self.visits[node] + 1)) / np.sqrt(visits)
+        return children.start + int(scores.argmax())
+
+    def best_child_puct(self, node, c_param=1.4):
+        # PUCT (AlphaZero style): Q + c * prior * sqrt(N) / (1 + n), unvisited children scoring
+        # Q = 0. Blocks are in decreasing prior order, so of the unvisited children only the
+        # next one in block order can win and it is the only one scored. Returns the child slot.
+        first = int(self.first_child[node])
+        end = first + min(int(self.num_expanded[node]) + 1, int(self.num_children[node]))
+        stats = self.canonical[first:end] if self.table is not None else slice(first, end)
+        visits = self.visits[stats]
+        scores = self.value[stats] / np.maximum(visits, 1)
+        scores += c_param * math.sqrt(self.visits[node]) * self.prior[first:end] / (1.0 + visits)
+        return first + int(scores.argmax())
+
+    def subtree(self, node):
+        # Copy of the subtree under node as a new tree rooted at node, with block layout kept.
+        # Aliases to nodes outside the subtree are reset to unvisited children.
+        table = None if self.table is None else TranspositionTable(self.table.size_bits)
+        tree = MCTSTree(max(1024, 2 * self.size), table)
+        fields = ('visits', 'value', 'prior', 'num_children', 'num_expanded', 'player', 'hash')
+        for name in fields:
+            getattr(tree, name)[ROOT] = getattr(self, name)[node]
+        tree.moves[ROOT] = self.moves[node]
+        tree.size = 1
+        new_index = np.full(self.size, -1, dtype=np.int32)
+        new_index[node] = ROOT
+        queue = [(node, ROOT)]
+        for old, new in queue:
+            count = self.num_children[old]
+            if count <= 0:
+                continue
+            first = self.first_child[old]
+            new_first = tree.size
+            src, dst = slice(first, first + count), slice(new_first, new_first + count)
+            for name in fields:
+                getattr(tree, name)[dst] = getattr(self, name)[src]
+            tree.parent[dst] = new
+            tree.moves[dst] = self.moves[src]
+            tree.first_child[new] = new_first
+            tree.size += count
+            new_index[src] = np.arange(new_first, new_first + count)
+            queue.extend((first + i, new_first + i) for i in range(count) if self.num_children[first + i] > 0)
+        if table is not None:
+            copied = np.flatnonzero(new_index >= 0)
+            aliased = copied[self.canonical[copied] != copied]
+            for old in aliased:
+                target = new_index[self.canonical[old]]
+                if target >= 0:
+                    tree.canonical[new_index[old]] = target
+                else:
+                    new = new_index[old]
+                    tree.visits[new] = 0
+                    tree.value[new] = 0.0
+                    tree.num_children[new] = -1
+                    tree.num_expanded[new] = 0
+            # Most visited nodes last, so they win table slots
+            for old in copied[np.argsort(self.visits[copied], kind='stable')]:
+                new = new_index[old]
+                if tree.canonical[new] == new and tree.visits[new] > 0:
+                    table.store(int(tree.hash[new]), int(new), tree)
+        return tree
+
+
+class TranspositionTable:
+    # Direct-mapped table from position hash to the tree node holding its statistics,
+    # with 2 ** size_bits entries (12 bytes each). On a slot collision the resident entry
+    # is kept if its node has been visited more than once, so well-searched positions stay.
+    def __init__(self, size_bits=16):
+        self.size_bits = size_bits
+        self.mask = (1 << size_bits) - 1
+        self.keys = np.zeros(1 << size_bits, dtype=np.uint64)
+        self.nodes = np.full(1 << size_bits, -1, dtype=np.int32)
+        self.lookups = 0
+        self.hits = 0
+
+    def lookup(self, key):
+        # Node stored for the position hash key, or -1
+        self.lookups += 1
+        slot = key & self.mask
+        node = self.nodes[slot]
+        if node >= 0 and self.keys[slot] == key:
+            self.hits += 1
+            return int(node)
+        return -1
+
+    def store(self, key, node, tree):
+        slot = key & self.mask
+        resident = self.nodes[slot]
+        if resident >= 0 and self.keys[slot] != key and tree.visits[resident] > 1:
+            return
+        self.keys[slot] = key
+        self.nodes[slot] = node
+
+    def stats(self):
+        return {
+            'lookups': self.lookups,
+            'hits': self.hits,
+            'hit_rate': self.hits / self.lookups if self.lookups else 0.0,
+            'entries': int((self.nodes >= 0).sum()),
+            'capacity': len(self.nodes),
+        }
 
-class MCTSNode:
-    def __init__(self, game, parent=None, move=None):
-        self.game = game  # Deep copy of the game state
-        self.parent = parent
-        self.move = move  # Move that led to this node
-        self.children = []
-        self.visits = 0
-        self.value = 0.0
-        self.untried_moves = game.get_legal_moves(game.current_player)
-
-    def is_fully_expanded(self):
-        return len(self.untried_moves) == 0
-
-    def best_child(self, c_param=1.4):
-        if not self.children:
-            # No children to choose from; return None or raise a clear error
-            raise ValueError("No children to select from in best_child. This usually means no moves are available.")
-        choices_weights = [
-            (child.value / (child.visits + 1e-6)) + c_param * np.sqrt(np.log(self.visits + 1) / (child.visits + 1e-6))
-            for child in self.children
-        ]
-        return self.children[int(np.argmax(choices_weights))]
-
-    def expand(self):
-        move = self.untried_moves.pop(random.randrange(len(self.untried_moves)))
-        next_game = copy.deepcopy(self.game)
-        next_game.make_move(move)
-        child_node = MCTSNode(next_game, parent=self, move=move)
-        self.children.append(child_node)
-        return child_node
-
-    def is_terminal(self):
-        return self.game.is_game_over()
-
-    def rollout_policy(self, legal_moves):
-        return random.choice(legal_moves)
 
 class MCTSAgent:
-    def __init__(self, policy_agent, value_agent=None, num_simulations=200, c_param=1.4):
+    def __init__(self, policy_agent, value_agent=None, num_simulations=200, c_param=1.4, reuse_tree=True,
+                 tt_bits=None, batch_size=1, virtual_loss=1.0, max_time_ms=None, rollout_engine=None,
+                 selection='ucb', tablebase=None, opening_book=None, early_stop=None):
+        if num_simulations is None and max_time_ms is None:
+            raise ValueError("MCTSAgent needs num_simulations, max_time_ms or both")
+        if selection not in ('ucb', 'puct'):
+            raise ValueError(f"Unknown MCTS selection '{selection}'")
         self.policy_agent = policy_agent  # NEATAgent for moves
         self.value_agent = value_agent    # ValueNEATAgent for board eval
+        # Search budget: at most num_simulations (None: no limit) and at most max_time_ms
+        # (None: no deadline) per move
         self.num_simulations = num_simulations
+        self.max_time_ms = max_time_ms
+        # Stop once the choice can no longer change; None: only when there is a deadline, so a
+        # fixed simulation count is always run in full
+        self.early_stop = early_stop
+        self.stats = None  # Simulations, speed and depth of the last search
         self.c_param = c_param
+        # 'ucb': UCB1, every child tried once in policy-sampled order.
+        # 'puct': PUCT weighted by each child's policy prior; weak moves may never be tried.
+        self.selection = selection
+        # Endgame tablebase (ai.tablebase): positions it covers are scored exactly, not searched
+        self.tablebase = tablebase
+        # Opening book (ai.opening_book): its move is played without a search while the game is in it
+        self.opening_book = opening_book
+        # Keep the subtree under the chosen move and continue from it on the next call
+        self.reuse_tree = reuse_tree
+        self._kept = None
+        # Share statistics between transpositions through a table of 2 ** tt_bits entries (None: off)
+        self.tt_bits = tt_bits
+        self.tt_stats = None  # Table statistics of the last search
+        # With a value_agent, evaluate batch_size leaves per predict_values call; the leaves
+        # of a batch are spread out by virtual_loss
+        self.batch_size = batch_size
+        self.virtual_loss = virtual_loss
+        # Plays out leaves when there is no value_agent
+        self.rollout_engine = rollout_engine if rollout_engine is not None else RolloutEngine()
+
+    def reset(self):
+        # Drop the kept tree, e.g. when a new game starts
+        self._kept = None
+
+    def _reuse_root(self, game):
+        # The kept node is the position after our last move; the position we are asked about
+        # now is normally one of its children (the opponent's reply)
+        kept, self._kept = self._kept, None
+        if kept is None:
+            return None
+        tree, node = kept
+        for candidate in [node, *tree.children(node)]:
+            candidate = tree.canonical[candidate]
+            if tree.visits[candidate] > 0 and tree.hash[candidate] == game.hash:
+                return tree.subtree(candidate)
+        return None
+
+    def new_tree(self, game):
+        # Search tree for game's position: the reused subtree if there is one, else a fresh root
+        tree = self._reuse_root(game) if self.reuse_tree else None
+        if tree is None:
+            table = TranspositionTable(self.tt_bits) if self.tt_bits else None
+            tree = MCTSTree.from_game(game, table=table)
+        return tree
 
     def select_move(self, game):
-        root = MCTSNode(copy.deepcopy(game))
-        for _ in range(self.num_simulations):
-            node = root
-            # Selection
-            while not node.is_terminal() and node.is_fully_expanded():
-                node = node.best_child(self.c_param)
-            # Expansion
-            if not node.is_terminal() and not node.is_fully_expanded():
-                node = self.expand_with_policy(node)
-            # Simulation
-            reward = self.rollout(node.game)
-            # Backpropagation
-            self.backpropagate(node, reward)
-        # Choose the move with the most visits
-        if not root.children:
+        move = self._stored_move(game)
+        if move is not None:
+            return move
+        tree = self.search(game)
+        children, stats = tree.child_stats(ROOT)
+        if not children:
             return None  # No moves available
-        best_child = max(root.children, key=lambda n: n.visits)
-        return best_child.move
-
-    def expand_with_policy(self, node):
-        # Use policy_agent to bias which move to expand
-        moves = node.untried_moves
-        if hasattr(self.policy_agent, 'select_move') and len(moves) > 1:
-            # Get policy outputs for all moves
-            outputs = self.policy_agent.net.activate(np.array(getattr(node.game.board, 'board', node.game.board)).flatten() / 4.0)
-            # Softmax over outputs for available moves
-            move_scores = [outputs[idx] if idx < len(outputs) else -float('inf') for idx in range(len(moves))]
-            exp_scores = np.exp(move_scores - np.max(move_scores))
-            probs = exp_scores / np.sum(exp_scores)
-            move_idx = np.random.choice(len(moves), p=probs)
+        # Choose the move with the most visits
+        best_child = children[int(np.argmax(tree.visits[stats]))]
+        if self.reuse_tree:
+            self._kept = (tree, best_child)
+        return tree.moves[best_child]
+
+    def search(self, game):
+        # Searches from game's position within the budget and returns the tree (root at ROOT).
+        # Search on a private copy; every simulation unmakes its moves before the next one
+        game = game.copy()
+        tree = self.new_tree(game)
+        start = time.perf_counter()
+        deadline = start + self.max_time_ms / 1000.0 if self.max_time_ms is not None else None
+        limit = self.num_simulations if self.num_simulations is not None else math.inf
+        batched = self.batch_size > 1 and self.value_agent is not None
+        early_stop = self.stops_early()
+        done = 0
+        next_check = 16
+        max_depth = 0
+        stopped = 'simulations'
+        while done < limit:
+            now = time.perf_counter()
+            if deadline is not None and now >= deadline:
+                stopped = 'time'
+                break
+            if early_stop and done >= next_check:
+                next_check = done + 16
+                if self._decided(tree, limit - done, done, now - start, deadline - now if deadline is not None else None):
+                    stopped = 'early'
+                    break
+            if batched:
+                count, depth = self._simulate_batch(tree, game, int(min(self.batch_size, limit - done)))
+            else:
+                count, depth = 1, self._simulate(tree, game)
+            done += count
+            max_depth = max(max_depth, depth)
+        self._record_stats(tree, done, time.perf_counter() - start, max_depth, stopped)
+        return tree
+
+    def _stored_move(self, game):
+        # The opening book's move, else the tablebase's best move when every move leads to a
+        # position it covers; None when the position needs a search
+        moves = game.get_status()[0]
+        if not moves:
+            return None
+        for source, table in (('book', self.opening_book), ('tablebase', self.tablebase)):
+            move = table.best_move(game.board, game.current_player, moves) if table is not None else None
+            if move is not None:
+                self._kept = None
+                self._record_stats(None, 0, 0.0, 0, source)
+                return move
+        return None
+
+    def _tablebase_reward(self, game):
+        # Exact result of game's position from reward_player()'s view, or None if not covered
+        if self.tablebase is None:
+            return None
+        known = self.tablebase.probe(game.board, game.current_player)
+        if known is None:
+            return None
+        return float(known[0] if game.current_player == self.reward_player() else -known[0])
+
+    def _record_stats(self, tree, simulations, elapsed, max_depth, stopped):
+        # stopped: 'simulations' (budget used up), 'time' (deadline), 'early' (choice settled)
+        # 'book' or 'tablebase' (move taken from the opening book or tablebase without a search)
+        self.stats = {
+            'simulations': simulations,
+            'time_ms': 1000.0 * elapsed,
+            'simulations_per_sec': simulations / elapsed if elapsed > 0 else 0.0,
+            'max_depth': max_depth,
+            'root_visits': int(tree.visits[ROOT]) if tree is not None else simulations,
+            'stopped': stopped,
+        }
+        if tree is not None and tree.table is not None:
+            self.tt_stats = tree.table.stats()
+
+    def stops_early(self):
+        return self.early_stop if self.early_stop is not None else self.max_time_ms is not None
+
+    def _decided(self, tree, remaining, done, elapsed, time_left):
+        # True once the most visited root child cannot be overtaken by the simulations left
+        # (estimated from the speed so far under a deadline)
+        if time_left is not None and elapsed > 0:
+            remaining = min(remaining, done / elapsed * time_left)
+        children, stats = tree.child_stats(ROOT)
+        if len(children) < 2:
+            return True
+        visits = np.sort(tree.visits[stats])
+        return visits[-1] - visits[-2] > remaining
+
+    def _simulate(self, tree, game):
+        # One simulation; returns the depth of its leaf
+        path, undo_stack = self.select_leaf(tree, game)
+        depth = len(undo_stack)
+        # Simulation
+        reward = self.rollout(game)
+        # Backpropagation
+        self.backpropagate(tree, path, reward)
+        while undo_stack:
+            game.unmake_move(undo_stack.pop())
+        return depth
+
+    def _simulate_batch(self, tree, game, count):
+        # Selects count leaves under virtual loss, scores them with one batched value network
+        # call, then backs them all up; returns (count, deepest leaf depth)
+        paths = []
+        boards = []
+        depth = 0
+        for _ in range(count):
+            path, undo_stack = self.select_leaf(tree, game)
+            depth = max(depth, len(undo_stack))
+            reward = self._tablebase_reward(game)
+            if reward is not None:
+                self.backpropagate(tree, path, reward)
+            else:
+                self.add_virtual_loss(tree, path, self.virtual_loss)
+                paths.append(path)
+                boards.append(game.board.copy())
+            while undo_stack:
+                game.unmake_move(undo_stack.pop())
+        values = self.value_agent.predict_values(boards) if boards else []
+        for path, value in zip(paths, values):
+            self.add_virtual_loss(tree, path, self.virtual_loss, count=-1)
+            self.backpropagate(tree, path, float(value))
+        return count, depth
+
+    def select_leaf(self, tree, game):
+        # Selection and expansion: plays moves on game from the root down to a node visited
+        # for the first time or a terminal node. Returns (path, undo records to take the moves
+        # back); path lists the nodes whose statistics the simulation updates, root first.
+        node = ROOT
+        path = [ROOT]
+        undo_stack = []
+        table = tree.table
+        while True:
+            if tree.num_children[node] < 0:
+                if node != ROOT and self._tablebase_reward(game) is not None:
+                    # Covered by the tablebase: an exact leaf, never expanded
+                    tree.num_children[node] = 0
+                    return path, undo_stack
+                self.expand(tree, node, game)
+            count = tree.num_children[node]
+            if count == 0:
+                return path, undo_stack  # Terminal
+            expanded = tree.num_expanded[node]
+            if self.selection == 'puct':
+                child = tree.best_child_puct(node, self.c_param)
+            elif expanded < count:
+                child = tree.first_child[node] + expanded
+            else:
+                child = tree.best_child(node, self.c_param)
+            if child == tree.first_child[node] + expanded:
+                # First visit of the child
+                tree.num_expanded[node] = expanded + 1
+                undo_stack.append(game.make_move(tree.moves[child]))
+                key = game.hash
+                tree.hash[child] = key
+                if table is not None:
+                    known = table.lookup(key)
+                    if known >= 0:
+                        # Transposition: share the known node's statistics and keep searching
+                        # below it, unless it is already on this path
+                        tree.canonical[child] = known
+                        if known in path:
+                            return path, undo_stack
+                        node = known
+                        path.append(node)
+                        continue
+                    table.store(key, int(child), tree)
+                path.append(child)
+                return path, undo_stack
+            undo_stack.append(game.make_move(tree.moves[child]))
+            node = tree.canonical[child]
+            if node in path:
+                return path, undo_stack  # Cycle through a transposition
+            path.append(node)
+
+    def expand(self, tree, node, game):
+        # Allocates node's children with their priors, from one policy evaluation. Their order
+        # is the order they will be tried in: by decreasing prior for PUCT, else sampled from
+        # the priors. Without a policy network the priors are uniform and the order random.
+        moves = game.get_status()[0]
+        if hasattr(self.policy_agent, 'policy_outputs') and len(moves) > 1:
+            # Softmax over the policy outputs of the available moves
+            player = game.current_player
+            outputs = self.policy_agent.policy_outputs(game.board, player)
+            probs = policy_priors(outputs, moves, player)
+            if self.selection == 'puct':
+                order = np.argsort(-probs, kind='stable')
+            else:
+                order = np.random.choice(len(moves), size=len(moves), replace=False, p=probs)
+            tree.add_children(node, [moves[i] for i in order], probs[order])
         else:
-            move_idx = random.randrange(len(moves))
-        move = moves.pop(move_idx)
-        next_game = copy.deepcopy(node.game)
-        next_game.make_move(move)
-        child_node = MCTSNode(next_game, parent=node, move=move)
-        node.children.append(child_node)
-        return child_node
+            moves = list(moves)
+            random.shuffle(moves)
+            tree.add_children(node, moves, np.full(len(moves), 1.0 / max(len(moves), 1)))
+
+    def reward_player(self):
+        # Player whose view rollout() rewards are given from
+        agent = self.value_agent if self.value_agent is not None else self.policy_agent
+        return agent.player
 
     def rollout(self, game):
-        rollout_game = copy.deepcopy(game)
+        reward = self._tablebase_reward(game)
+        if reward is not None:
+            return reward
         # If value_agent exists, use it for leaf eval
         if self.value_agent is not None:
-            return self.value_agent.predict_value(rollout_game.board)
-        # Fallback: play to terminal state
-        while not rollout_game.is_game_over():
-            legal_moves = rollout_game.get_legal_moves(rollout_game.current_player)
-            if not legal_moves:
-                break
-            if rollout_game.current_player == self.policy_agent.player:
-                move = self.policy_agent.select_move(rollout_game.board, legal_moves)
-            else:
-                move = random.choice(legal_moves)
-            rollout_game.make_move(move)
-        winner = rollout_game.get_winner()
-        if winner == self.policy_agent.player:
-            return 1.0
-        elif winner == 0:
-            return 0.0
-        else:
-            return -1.0
-
-    def backpropagate(self, node, reward):
-        while node is not None:
-            node.visits += 1
-            node.value += reward
-            reward = -reward
-            node = node.parent
+            return self.value_agent.predict_value(game.board)
+        # Fallback: a fast playout on the board, cut off by the engine's depth limit
+        return self.rollout_engine.rollout(game.board, game.current_player, self.policy_agent.player)
+
+    def add_virtual_loss(self, tree, path, loss, count=1):
+        # Counts pending visits along path as losses so searches running ahead of their
+        # evaluations spread out; call again with count=-1 to take them back
+        for node in path:
+            tree.visits[node] += count
+            tree.value[node] -= count * loss
+
+    def backpropagate(self, tree, path, reward):
+        # reward is from reward_player()'s view; each node adds it from the view of the
+        # player who moved into it (the opponent of the side to move there)
+        player = self.reward_player()
+        for node in path:
+            tree.visits[node] += 1
+            tree.value[node] += -reward if tree.player[node] == player else reward
@@ -0,0 +1,241 @@
+import math
+import time
+from ai.encoding import side_to_move
+from checkers.board import Board, ZOBRIST_SIDE
+
+# Leaf evaluations lie in [-1, 1]; a won position scores WIN less its distance in plies
+WIN = 1000.0
+WIN_BOUND = WIN / 2  # Scores beyond this are wins or losses
+
+# Bound of a table entry's score
+EXACT, LOWER, UPPER = 0, 1, 2
+
+
+class _SearchTimeout(Exception):
+    pass
+
+
+class MinimaxAgent:
+    # Iterative-deepening alpha-beta (negamax) on a Board with apply_move/undo_move.
+    # - Transposition table: direct-mapped, 2 ** tt_bits entries of
+    #   (hash, depth, bound, score, best move), kept between moves until reset().
+    # - Move ordering: the table's best move, then longer captures, killer moves (two per
+    #   ply), then the history heuristic.
+    # - Capture extension: captures are forced, so a position with a capture pending is searched
+    #   on past the depth limit (up to max_ply) rather than evaluated mid-exchange.
+    # Leaves are scored by value_agent (a ValueNEATAgent) or, without one, by material balance;
+    # positions in the tablebase (ai.tablebase) get their exact result and are not searched.
+    # While the game is in the opening book (ai.opening_book), its move is played without a search.
+    # select_move takes a CheckersGame, or a Board / 8x8 array with its legal moves like NEATAgent.
+    def __init__(self, player=2, depth=6, max_time_ms=None, value_agent=None, tt_bits=18, king_value=1.5,
+                 max_ply=64, tablebase=None, opening_book=None):
+        if depth is None and max_time_ms is None:
+            raise ValueError("MinimaxAgent needs depth, max_time_ms or both")
+        self.player = player
+        # Search budget: iterations up to depth plies (None: no limit) within max_time_ms
+        # (None: no deadline); an iteration cut off by the deadline is discarded
+        self.depth = depth
+        self.max_time_ms = max_time_ms
+        self.value_agent = value_agent
+        self.king_value = king_value  # Material value of a king, a man counting 1
+        self.max_ply = max_ply
+        self.tt_bits = tt_bits
+        self.tablebase = tablebase
+        self.opening_book = opening_book
+        self.stats = None  # Depth, nodes and speed of the last search
+        self.reset()
+
+    def reset(self):
+        # Clear the table and move-ordering statistics, e.g. when a new game starts
+        self.table = [None] * (1 << self.tt_bits)
+        self.history = {}
+        self.killers = [[None, None] for _ in range(self.max_ply + 1)]
+
+    def select_move(self, board, legal_moves=None):
+        if legal_moves is None:
+            game = board
+            board, legal_moves, player = game.board, game.get_legal_moves(), game.current_player
+        elif not legal_moves:
+            return None
+        else:
+            if not isinstance(board, Board):
+                arr = board
+                board = Board()
+                board.board = arr
+            player = side_to_move(board, legal_moves)
+        if not legal_moves:
+            return None
+        return self.search(board, player, legal_moves)[0]
+
+    def evaluate(self, board, player):
+        # Static score of board from player's view, in [-1, 1]
+        if self.value_agent is not None:
+            value = self.value_agent.predict_value(board)
+            return value if self.value_agent.player == player else -value
+        counts = board.counts
+        own = counts[player] + self.king_value * counts[player + 2]
+        opp = counts[3 - player] + self.king_value * counts[5 - player]
+        return (own - opp) / (own + opp)
+
+    def search(self, board, player, legal_moves):
+        # Deepens one ply at a time within the budget; returns (best move, score) of the
+        # deepest completed iteration
+        start = time.perf_counter()
+        deadline = start + self.max_time_ms / 1000.0 if self.max_time_ms is not None else None
+        self._deadline = deadline
+        self.nodes = 0
+        self.killers = [[None, None] for _ in range(self.max_ply + 1)]
+        # Age the history so the previous move's cutoffs do not dominate
+        self.history = {key: value // 2 for key, value in self.history.items() if value > 1}
+        best_move, best_score, completed = legal_moves[0], 0.0, 0
+        move = self.opening_book.best_move(board, player, legal_moves) if self.opening_book is not None else None
+        if move is not None:
+            best_move = move
+            legal_moves = [move]
+        elif self.tablebase is not None:
+            move = self.tablebase.best_move(board, player, legal_moves)
+            if move is not None:
+                best_move, best_score = move, self._known_score(self.tablebase.probe(board, player), 0)
+                legal_moves = [move]
+        depth = 1
+        while len(legal_moves) > 1 and depth <= min(self.depth or self.max_ply, self.max_ply):
+            try:
+                # A private copy: an iteration cut off by the deadline leaves its moves on the board
+                move, score = self._search_root(board.copy(), player, legal_moves, depth, best_move)
+            except _SearchTimeout:
+                break
+            best_move, best_score, completed = move, score, depth
+            if abs(score) > WIN_BOUND:
+                break  # Forced result found
+            if deadline is not None and time.perf_counter() >= deadline:
+                break
+            depth += 1
+        elapsed = time.perf_counter() - start
+        self.stats = {
+            'depth': completed,
+            'nodes': self.nodes,
+            'time_ms': 1000.0 * elapsed,
+            'nodes_per_sec': self.nodes / elapsed if elapsed > 0 else 0.0,
+            'score': best_score,
+        }
+        return best_move, best_score
+
+    def _search_root(self, board, player, legal_moves, depth, previous_best):
+        # The previous iteration's best move is searched first
+        moves = sorted(legal_moves, key=lambda move: move is not previous_best)
+        alpha = -math.inf
+        best_move = moves[0]
+        for move in moves:
+            undo = board.apply_move(move)
+            score = -self._negamax(board, 3 - player, depth - 1, -math.inf, -alpha, 1)
+            board.undo_move(undo)
+            if score > alpha:
+                alpha = score
+                best_move = move
+        self._store(board, player, depth, EXACT, alpha, best_move[:4], 0)
+        return best_move, alpha
+
+    def _negamax(self, board, player, depth, alpha, beta, ply):
+        self.nodes += 1
+        if self._deadline is not None and not self.nodes & 255 and time.perf_counter() >= self._deadline:
+            raise _SearchTimeout()
+        if self.tablebase is not None:
+            known = self.tablebase.probe(board, player)
+            if known is not None:
+                return self._known_score(known, ply)
+        key = board.hash ^ ZOBRIST_SIDE if player == 2 else board.hash
+        entry = self.table[key & len(self.table) - 1]
+        table_move = None
+        if entry is not None and entry[0] == key:
+            table_move = entry[4]
+            if entry[1] >= depth:
+                score, bound = self._from_table(entry[3], ply), entry[2]
+                if bound == EXACT or (bound == LOWER and score >= beta) or (bound == UPPER and score <= alpha):
+                    return score
+        moves = board.get_legal_moves(player)
+        if not moves:
+            return ply - WIN  # The side to move has lost
+        capture = bool(moves[0][4])
+        if (depth <= 0 and not capture) or ply >= self.max_ply:
+            return self.evaluate(board, player)
+        original_alpha = alpha
+        best_score = -math.inf
+        best_key = None
+        for move in self._order(moves, table_move, ply, capture):
+            undo = board.apply_move(move)
+            score = -self._negamax(board, 3 - player, depth - 1, -beta, -alpha, ply + 1)
+            board.undo_move(undo)
+            if score > best_score:
+                best_score = score
+                best_key = move[:4]
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        if not capture:
+                            killers = self.killers[ply]
+                            if killers[0] != best_key:
+                                killers[1] = killers[0]
+                                killers[0] = best_key
+                            self.history[best_key] = self.history.get(best_key, 0) + max(depth, 1) ** 2
+                        break
+        if best_score <= original_alpha:
+            bound = UPPER
+        elif best_score >= beta:
+            bound = LOWER
+        else:
+            bound = EXACT
+        self._store(board, player, depth, bound, best_score, best_key, ply)
+        return best_score
+
+    def _order(self, moves, table_move, ply, capture):
+        if len(moves) == 1:
+            return moves
+        killers = self.killers[ply]
+        history = self.history
+
+        def priority(move):
+            key = move[:4]
+            if key == table_move:
+                return math.inf
+            if capture:
+                return len(move[4])
+            if key == killers[0] or key == killers[1]:
+                return 1e12
+            return history.get(key, 0)
+
+        return sorted(moves, key=priority, reverse=True)
+
+    def _store(self, board, player, depth, bound, score, move_key, ply):
+        # Replaces another position's entry, but not a deeper search of the same position
+        key = board.hash ^ ZOBRIST_SIDE if player == 2 else board.hash
+        slot = key & len(self.table) - 1
+        entry = self.table[slot]
+        if entry is None or entry[0] != key or entry[1] <= depth:
+            self.table[slot] = (key, depth, bound, self._to_table(score, ply), move_key)
+
+    @staticmethod
+    def _known_score(known, ply):
+        # Search score of a tablebase (result, distance) found ply plies from the root
+        result, distance = known
+        if result > 0:
+            return WIN - (ply + distance)
+        if result < 0:
+            return ply + distance - WIN
+        return 0.0
+
+    @staticmethod
+    def _to_table(score, ply):
+        # Win and loss scores are stored as distances from the stored node, not from the root
+        if score > WIN_BOUND:
+            return score + ply
+        if score < -WIN_BOUND:
+            return score - ply
+        return score
+
+    @staticmethod
+    def _from_table(score, ply):
+        if score > WIN_BOUND:
+            return score - ply
+        if score < -WIN_BOUND:
+            return score + ply
+        return score
@@ -0,0 +1,58 @@
+import hashlib
+import pickle
+from collections import OrderedDict
+import neat
+from ai.compiled_net import CompiledNetwork
+
+
+class NetworkCache:
+    # Worker-local LRU of unpickled genomes and their built networks, keyed by
+    # (kind, genome key, fingerprint of the pickled genome), so a genome that shows up in
+    # many evaluation tasks is unpickled and compiled once per worker process.
+    def __init__(self, maxsize=512):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def _get(self, kind, key, genome_data, build):
+        cache_key = (kind, key, hashlib.blake2b(genome_data, digest_size=16).digest())
+        entry = self._entries.get(cache_key)
+        if entry is not None:
+            self._entries.move_to_end(cache_key)
+            self.hits += 1
+            return entry
+        self.misses += 1
+        entry = build(pickle.loads(genome_data))
+        self._entries[cache_key] = entry
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+        return entry
+
+    def get_policy(self, key, genome_data, config):
+        # Returns (genome, FeedForwardNetwork)
+        return self._get('policy', key, genome_data,
+                         lambda genome: (genome, neat.nn.FeedForwardNetwork.create(genome, config)))
+
+    def get_value(self, key, genome_data, config):
+        # Returns (genome, FeedForwardNetwork, CompiledNetwork or None)
+        def build(genome):
+            try:
+                compiled = CompiledNetwork.create(genome, config)
+            except ValueError:
+                compiled = None
+            return genome, neat.nn.FeedForwardNetwork.create(genome, config), compiled
+        return self._get('value', key, genome_data, build)
+
+    def clear(self):
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+# One cache per process: ProcessPoolExecutor workers each keep their own across the tasks they run
+_cache = NetworkCache()
+
+
+def get_network_cache():
+    return _cache
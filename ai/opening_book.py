@@ -0,0 +1,180 @@
+"""
+Opening book built from recorded games: how often each move was played in each of the
+first positions of a game, and how it scored for the side that played it.
+
+    python -m ai.opening_book --histories analysis/game_histories --plies 16
+
+The histories are the pickles written by play_match(save_history=True) and
+ExperienceReplayBuffer.add_history. Every game is replayed from the initial position, and
+a game whose moves stop being legal is only used up to that point. Positions are keyed by
+their 64-bit Zobrist hash with the side to move (CheckersGame.hash), so transpositions
+share their statistics.
+
+The file is a small header followed by fixed-size records (hash, from square, to square,
+captured squares, wins, draws, losses) sorted by hash. The captured squares are a 32-bit
+mask, which tells apart jump chains that share their ends. OpeningBook loads the file
+into a dict from hash to moves, so a lookup costs one dict access.
+"""
+import argparse
+import os
+import pickle
+import struct
+import sys
+from checkers.board import RC_TO_SQUARE, ZOBRIST_SIDE
+from checkers.game import CheckersGame
+
+DEFAULT_PATH = os.path.join('analysis', 'opening_book.bin')
+DEFAULT_HISTORIES = os.path.join('analysis', 'game_histories')
+
+MAGIC = b'CKOB'
+VERSION = 2
+_HEADER = struct.Struct('<4sHI')     # magic, version, number of records
+_RECORD = struct.Struct('<QBBIIII')  # position hash, from, to, captured squares, wins, draws, losses
+
+
+def _move_squares(move):
+    # (from square, to square, mask of the captured squares): the same for two moves only
+    # if they lead to the same position
+    fr, fc, tr, tc = move[:4]
+    captured = 0
+    for r, c in move[4]:
+        captured |= 1 << RC_TO_SQUARE[r][c]
+    return RC_TO_SQUARE[fr][fc], RC_TO_SQUARE[tr][tc], captured
+
+
+def _history_files(paths):
+    # The .pkl files among paths, directories expanded, in a stable order
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(os.path.join(path, name) for name in sorted(os.listdir(path)) if name.endswith('.pkl'))
+        elif os.path.exists(path):
+            files.append(path)
+    return files
+
+
+def add_game(stats, history, winner, max_plies):
+    # Adds the first max_plies moves of a recorded game to stats, a dict from
+    # (hash, from square, to square, captured squares) to [wins, draws, losses] of the side
+    # that moved.
+    # winner None (an unfinished game) counts as a draw. Returns the number of moves used.
+    game = CheckersGame()
+    used = 0
+    for entry in history[:max_plies]:
+        squares = _move_squares(entry['move'])
+        # Jump chains can share their ends; replay the one that took the recorded pieces
+        legal = [m for m in game.get_status()[0] if _move_squares(m) == squares]
+        if entry.get('player', game.current_player) != game.current_player or not legal:
+            break  # Not a game from the initial position, or a corrupt record
+        mover = game.current_player
+        key = (game.hash,) + squares
+        counts = stats.setdefault(key, [0, 0, 0])
+        counts[0 if winner == mover else 2 if winner == 3 - mover else 1] += 1
+        game.make_move(legal[0])
+        used += 1
+    return used
+
+
+def build_opening_book(history_paths, path=DEFAULT_PATH, max_plies=16, min_games=1, verbose=True):
+    # Replays the games under history_paths and writes the moves played at least min_games
+    # times from the first max_plies positions
+    stats = {}
+    games = moves = 0
+    for name in _history_files(history_paths):
+        with open(name, 'rb') as f:
+            record = pickle.load(f)
+        used = add_game(stats, record['history'], record.get('winner'), max_plies)
+        games += used > 0
+        moves += used
+    records = sorted((key, counts) for key, counts in stats.items() if sum(counts) >= min_games)
+    if verbose:
+        print(f'{games} games, {moves} book moves, {len(records)} records')
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(_HEADER.pack(MAGIC, VERSION, len(records)))
+        for key, counts in records:
+            f.write(_RECORD.pack(*key, *counts))
+    os.replace(tmp_path, path)
+    return len(records)
+
+
+class OpeningBook:
+    # Move statistics of an opening book file, held in a dict keyed by position hash.
+    # Pickles as its path, like Tablebase.
+    def __init__(self, path=DEFAULT_PATH, min_games=2):
+        self.path = path
+        self.min_games = min_games  # Moves played fewer times than this are ignored
+        with open(path, 'rb') as f:
+            data = f.read()
+        magic, version, count = _HEADER.unpack_from(data, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f'{path} is not a version {VERSION} opening book')
+        self.positions = {}
+        end = _HEADER.size + count * _RECORD.size
+        for key, src, dst, captured, wins, draws, losses in _RECORD.iter_unpack(data[_HEADER.size:end]):
+            self.positions.setdefault(key, []).append((src, dst, captured, wins, draws, losses))
+        self.probes = 0
+        self.hits = 0
+
+    def __reduce__(self):
+        return (OpeningBook, (self.path, self.min_games))
+
+    def __len__(self):
+        return len(self.positions)
+
+    def lookup(self, board, player):
+        # [(from square, to square, captured squares, wins, draws, losses)] of the position
+        # with player to move, or None if it is not in the book
+        self.probes += 1
+        entries = self.positions.get(board.hash ^ ZOBRIST_SIDE if player == 2 else board.hash)
+        if entries is not None:
+            self.hits += 1
+        return entries
+
+    def best_move(self, board, player, legal_moves):
+        # The legal move with the best smoothed score (wins + draws / 2 + 1) / (games + 2)
+        # among those played at least min_games times; None if there is none
+        entries = self.lookup(board, player)
+        if entries is None:
+            return None
+        by_squares = {_move_squares(move): move for move in legal_moves}
+        best_move, best_key = None, None
+        for src, dst, captured, wins, draws, losses in entries:
+            games = wins + draws + losses
+            move = by_squares.get((src, dst, captured))
+            if move is None or games < self.min_games:
+                continue
+            key = ((wins + 0.5 * draws + 1) / (games + 2), games)
+            if best_key is None or key > best_key:
+                best_move, best_key = move, key
+        return best_move
+
+
+_books = {}
+
+
+def load_opening_book(path=DEFAULT_PATH):
+    # The OpeningBook at path, read once per process; None if there is no such file
+    if path not in _books:
+        _books[path] = OpeningBook(path) if os.path.exists(path) else None
+    return _books[path]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Build an opening book from recorded game histories')
+    parser.add_argument('--histories', nargs='+', default=[DEFAULT_HISTORIES],
+                        help='History pickles, or directories of them')
+    parser.add_argument('--plies', type=int, default=16, help='Moves of each game to add to the book')
+    parser.add_argument('--min-games', type=int, default=1, help='Leave out moves played fewer times')
+    parser.add_argument('--output', default=DEFAULT_PATH, help='Opening book file to write')
+    args = parser.parse_args(argv)
+    if not _history_files(args.histories):
+        parser.error(f'no game histories found in {" ".join(args.histories)}')
+    build_opening_book(args.histories, args.output, args.plies, args.min_games)
+    print(f'Wrote {args.output} ({os.path.getsize(args.output)} bytes)')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,173 @@
+import os
+import random
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+import numpy as np
+from ai.mcts import ROOT, MCTSAgent
+
+# Search agent of each worker process, set up once by _init_worker
+_worker_agent = None
+
+
+def _init_worker(policy_agent, value_agent, c_param, tt_bits, batch_size, rollout_engine, selection, tablebase,
+                 early_stop):
+    global _worker_agent
+    _worker_agent = MCTSAgent(policy_agent, value_agent, c_param=c_param, reuse_tree=False, tt_bits=tt_bits,
+                              batch_size=batch_size, rollout_engine=rollout_engine, selection=selection,
+                              tablebase=tablebase, early_stop=early_stop)
+
+
+def _seed(seed):
+    # Forked workers start from the same random state; give every task its own
+    random.seed(seed)
+    np.random.seed(seed % 2 ** 32)
+
+
+def _search_root(args):
+    # Root parallelism: one independent search; returns the visits of each root move in
+    # get_status order, and the search's stats
+    game, num_simulations, max_time_ms, seed = args
+    _seed(seed)
+    _worker_agent.num_simulations = num_simulations
+    _worker_agent.max_time_ms = max_time_ms
+    tree = _worker_agent.search(game)
+    moves = game.get_status()[0]
+    visits = [0] * len(moves)
+    children, stats = tree.child_stats(ROOT)
+    for child, child_visits in zip(children, tree.visits[stats]):
+        visits[moves.index(tree.moves[child])] += int(child_visits)
+    return visits, _worker_agent.stats
+
+
+def _evaluate_leaf(args):
+    # Tree parallelism: the rollout (or value estimate) of one leaf position
+    game, seed = args
+    _seed(seed)
+    return _worker_agent.rollout(game)
+
+
+def _snapshot(game):
+    # Copy of game without its move history, to keep task pickles small
+    game = game.copy()
+    game.history = []
+    return game
+
+
+class ParallelMCTSAgent(MCTSAgent):
+    # MCTS spread over a pool of worker processes.
+    # mode='root': each worker grows its own tree for a share of num_simulations and the
+    #   root visit counts are summed.
+    # mode='tree': one shared tree in this process; selection adds virtual loss along the
+    #   path so up to 2 * workers leaves can be evaluated by the workers at once.
+    def __init__(self, policy_agent, value_agent=None, num_simulations=200, c_param=1.4,
+                 mode='root', workers=None, virtual_loss=1.0, reuse_tree=True, tt_bits=None, batch_size=1,
+                 max_time_ms=None, rollout_engine=None, selection='ucb', tablebase=None, opening_book=None,
+                 early_stop=None):
+        # batch_size applies to the workers' own searches in root mode
+        if mode not in ('root', 'tree'):
+            raise ValueError(f"Unknown parallel MCTS mode '{mode}'")
+        super().__init__(policy_agent, value_agent, num_simulations, c_param,
+                         reuse_tree=reuse_tree and mode == 'tree', tt_bits=tt_bits,
+                         batch_size=batch_size, virtual_loss=virtual_loss, max_time_ms=max_time_ms,
+                         rollout_engine=rollout_engine, selection=selection, tablebase=tablebase,
+                         opening_book=opening_book, early_stop=early_stop)
+        self.mode = mode
+        self.workers = workers or os.cpu_count() or 1
+        self._executor = None
+
+    def _pool(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, initializer=_init_worker,
+                initargs=(self.policy_agent, self.value_agent, self.c_param, self.tt_bits, self.batch_size,
+                          self.rollout_engine, self.selection, self.tablebase, self.early_stop))
+        return self._executor
+
+    def close(self):
+        # Shuts the worker processes down; the pool is started again on the next search
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def select_move(self, game):
+        if self.mode == 'tree':
+            return super().select_move(game)
+        moves = game.get_status()[0]
+        if not moves:
+            return None
+        move = self._stored_move(game)
+        if move is not None:
+            return move
+        start = time.perf_counter()
+        if self.num_simulations is None:
+            shares = [None] * self.workers
+        else:
+            shares = [self.num_simulations // self.workers + (i < self.num_simulations % self.workers)
+                      for i in range(self.workers)]
+        snapshot = _snapshot(game)
+        tasks = [(snapshot, share, self.max_time_ms, random.getrandbits(63)) for share in shares if share != 0]
+        results = list(self._pool().map(_search_root, tasks))
+        totals = np.sum([visits for visits, _ in results], axis=0)
+        worker_stats = [stats for _, stats in results]
+        stopped = {s['stopped'] for s in worker_stats}
+        self._record_stats(None, sum(s['simulations'] for s in worker_stats), time.perf_counter() - start,
+                           max(s['max_depth'] for s in worker_stats),
+                           next(reason for reason in ('time', 'early', 'simulations') if reason in stopped))
+        return moves[int(np.argmax(totals))]
+
+    def search(self, game):
+        if self.mode == 'root':
+            return super().search(game)
+        game = game.copy()
+        tree = self.new_tree(game)
+        pool = self._pool()
+        start = time.perf_counter()
+        deadline = start + self.max_time_ms / 1000.0 if self.max_time_ms is not None else None
+        limit = self.num_simulations if self.num_simulations is not None else float('inf')
+        pending = {}
+        started = finished = 0
+        early_stop = self.stops_early()
+        next_check = 16
+        max_depth = 0
+        stopped = 'simulations'
+        selecting = True
+        while pending or (selecting and started < limit):
+            # Keep every worker busy, with one leaf queued behind each
+            while selecting and started < limit and len(pending) < 2 * self.workers:
+                if deadline is not None and time.perf_counter() >= deadline:
+                    selecting = False
+                    stopped = 'time'
+                    break
+                path, undo_stack = self.select_leaf(tree, game)
+                max_depth = max(max_depth, len(undo_stack))
+                self.add_virtual_loss(tree, path, self.virtual_loss)
+                pending[pool.submit(_evaluate_leaf, (_snapshot(game), random.getrandbits(63)))] = path
+                while undo_stack:
+                    game.unmake_move(undo_stack.pop())
+                started += 1
+            if not pending:
+                break
+            timeout = max(0.0, deadline - time.perf_counter()) if deadline is not None else None
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                # Deadline reached: drop the evaluations still running
+                for future, path in pending.items():
+                    future.cancel()
+                    self.add_virtual_loss(tree, path, self.virtual_loss, count=-1)
+                pending.clear()
+                stopped = 'time'
+                break
+            for future in done:
+                path = pending.pop(future)
+                self.add_virtual_loss(tree, path, self.virtual_loss, count=-1)
+                self.backpropagate(tree, path, future.result())
+                finished += 1
+            if selecting and early_stop and finished >= next_check:
+                next_check = finished + 16
+                now = time.perf_counter()
+                if self._decided(tree, limit - started, finished, now - start,
+                                 deadline - now if deadline is not None else None):
+                    selecting = False
+                    stopped = 'early'
+        self._record_stats(tree, finished, time.perf_counter() - start, max_depth, stopped)
+        return tree
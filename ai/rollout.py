@@ -0,0 +1,114 @@
+import random
+from checkers.board import (CROWN_ROW, FORWARD_DIRS, KING_DIRS, KING_JUMPS, MAN_JUMPS, MASK_32, NEIGHBOR, jump_chains,
+                            shift_squares)
+
+# Squares a man of each player crowns from with a single step
+_BEFORE_CROWN = {1: 0x000000F0, 2: 0x0F000000}
+
+
+def _popcount(bb):
+    return bin(bb).count('1')
+
+
+class RolloutEngine:
+    # Cheap playouts for MCTSAgent when there is no value network. Plays on copies of the
+    # board's bitboards (the Board itself is never touched) with a capture-first default
+    # policy instead of a network: the longest jump sequence, then a step that crowns a man,
+    # else a random move. Moves are generated straight from the bitboards, without building
+    # move tuples. After max_depth plies (None: play to the end) the position is scored by
+    # material, so long king endgames cannot stall a search.
+    def __init__(self, max_depth=60, king_value=1.5):
+        self.max_depth = max_depth
+        self.king_value = king_value  # Material value of a king, a man counting 1
+
+    def material(self, board, player):
+        # Material balance of a Board from player's view, in [-1, 1]
+        counts = board.counts
+        return self._balance(counts[player], counts[player + 2], counts[3 - player], counts[5 - player])
+
+    def _balance(self, own_men, own_kings, opp_men, opp_kings):
+        own = own_men + self.king_value * own_kings
+        opp = opp_men + self.king_value * opp_kings
+        total = own + opp
+        return (own - opp) / total if total else 0.0
+
+    def rollout(self, board, player, reward_player):
+        # Plays out board with player to move and returns the result from reward_player's
+        # view: +-1 for a win or loss, the material balance at the depth cutoff
+        pieces = [0, board.pieces[1], board.pieces[2]]
+        kings = board.kings
+        mover = player
+        depth = 0
+        while self.max_depth is None or depth < self.max_depth:
+            own = pieces[mover]
+            opp = pieces[3 - mover]
+            empty = ~(own | opp) & MASK_32
+            own_kings = own & kings
+            forward = FORWARD_DIRS[mover]
+            steps = []
+            jumpers = 0
+            for d in KING_DIRS:
+                movers = own if d in forward else own_kings
+                if movers:
+                    back = 3 - d
+                    open_back = shift_squares(empty, back)
+                    steps.append((d, movers & open_back))
+                    victims = opp & open_back
+                    if victims:
+                        jumpers |= movers & shift_squares(victims, back)
+            crown_row = CROWN_ROW[mover]
+            if jumpers:
+                # Captures are mandatory; take the longest, preferring one that crowns
+                best = []
+                best_score = -1
+                while jumpers:
+                    low = jumpers & -jumpers
+                    src = low.bit_length() - 1
+                    if own_kings & low:
+                        chains = jump_chains(src, KING_JUMPS, -1, opp, empty | low, with_path=False)
+                    else:
+                        chains = jump_chains(src, MAN_JUMPS[mover], crown_row, opp, empty | low,
+                                             with_path=False)
+                    for land, captured, _ in chains:
+                        score = 2 * _popcount(captured) + (land // 4 == crown_row and not own_kings & low)
+                        if score > best_score:
+                            best = [(src, land, captured)]
+                            best_score = score
+                        elif score == best_score:
+                            best.append((src, land, captured))
+                    jumpers ^= low
+                src, dst, captured = random.choice(best)
+            else:
+                # A step that crowns a man, else any step
+                before_crown = ~own_kings & _BEFORE_CROWN[mover]
+                crowning = [(d, steppers & before_crown) for d, steppers in steps
+                            if d in forward and steppers & before_crown]
+                candidates = []
+                for d, steppers in crowning or steps:
+                    neighbor = NEIGHBOR[d]
+                    while steppers:
+                        low = steppers & -steppers
+                        s = low.bit_length() - 1
+                        candidates.append((s, neighbor[s]))
+                        steppers ^= low
+                if not candidates:
+                    # The side to move has lost
+                    return -1.0 if mover == reward_player else 1.0
+                src, dst = random.choice(candidates)
+                captured = 0
+            src_bit = 1 << src
+            dst_bit = 1 << dst
+            pieces[mover] = own ^ src_bit ^ dst_bit
+            if captured:
+                pieces[3 - mover] = opp & ~captured
+                kings &= ~captured
+            if kings & src_bit:
+                kings ^= src_bit | dst_bit
+            elif dst // 4 == crown_row:
+                kings |= dst_bit
+            mover = 3 - mover
+            depth += 1
+        own = pieces[reward_player]
+        opp = pieces[3 - reward_player]
+        return self._balance(_popcount(own & ~kings), _popcount(own & kings),
+                             _popcount(opp & ~kings), _popcount(opp & kings))
@@ -0,0 +1,313 @@
+"""
+Endgame tablebases built by retrograde analysis: the result (win, loss or draw for the
+side to move) and distance in plies of every position with up to N pieces.
+
+    python -m ai.tablebase --pieces 3
+
+Positions are grouped by material signature (the men and kings of each side) and indexed
+combinatorially within their signature. The file holds one byte per index after a small
+signature table, and Tablebase probes it through a read-only memory map, so every process
+using the same file shares one copy in the OS page cache.
+"""
+import argparse
+import os
+import struct
+import sys
+import time
+from array import array
+from itertools import combinations
+from math import comb
+import numpy as np
+from checkers.board import Board, CROWN_ROW, MASK_32, RC_TO_SQUARE
+
+DEFAULT_PATH = os.path.join('analysis', 'tablebase.bin')
+
+MAGIC = b'CKTB'
+VERSION = 1
+_HEADER = struct.Struct('<4sHHI')  # magic, version, max pieces, number of signatures
+_ENTRY = struct.Struct('<4BQQ')    # men 1, kings 1, men 2, kings 2, data offset, data size
+
+# Stored bytes: 0 for an index that is no position (two pieces on one square), 1 for a draw,
+# 2 + 2 * d for a win and 3 + 2 * d for a loss of the side to move in d plies.
+# Distances saturate at MAX_DISTANCE.
+DRAW = 1
+MAX_DISTANCE = 126
+
+# Squares the men of each player can stand on (a man on its crowning row is a king)
+_MEN_SQUARES = {1: MASK_32 ^ 0x0000000F, 2: MASK_32 ^ 0xF0000000}
+_COMB = tuple(tuple(comb(n, k) for k in range(33)) for n in range(33))
+
+
+def _rank(bits, shift=0):
+    # Colexicographic rank of the set of squares in bits (numbered from shift) among all sets
+    # of the same size
+    rank = 0
+    i = 1
+    while bits:
+        low = bits & -bits
+        rank += _COMB[low.bit_length() - 1 - shift][i]
+        bits ^= low
+        i += 1
+    return rank
+
+
+def signature_size(signature):
+    # Number of indices of a (men 1, kings 1, men 2, kings 2) signature, both sides to move
+    men1, kings1, men2, kings2 = signature
+    return 2 * _COMB[28][men1] * _COMB[32][kings1] * _COMB[28][men2] * _COMB[32][kings2]
+
+
+def position_index(signature, men1, kings1, men2, kings2, player):
+    # Index within its signature of the position given as one bitboard per piece type
+    _, num_kings1, num_men2, num_kings2 = signature
+    index = _rank(men1, 4)
+    index = index * _COMB[32][num_kings1] + _rank(kings1)
+    index = index * _COMB[28][num_men2] + _rank(men2)
+    index = index * _COMB[32][num_kings2] + _rank(kings2)
+    return 2 * index + player - 1
+
+
+def signatures(max_pieces):
+    # Signatures with at least one piece a side and up to max_pieces in all, in solving
+    # order: captures lead to fewer pieces and promotions to fewer men
+    result = []
+    for pieces1 in range(1, max_pieces):
+        for pieces2 in range(1, max_pieces - pieces1 + 1):
+            for men1 in range(pieces1 + 1):
+                for men2 in range(pieces2 + 1):
+                    result.append((men1, pieces1 - men1, men2, pieces2 - men2))
+    result.sort(key=lambda signature: (sum(signature), signature[0] + signature[2]))
+    return result
+
+
+def _decode(value):
+    # (result, distance) from a stored byte, result being 1, 0 or -1 for the side to move
+    if value == DRAW:
+        return 0, 0
+    if value & 1:
+        return -1, (value - 3) >> 1
+    return 1, (value - 2) >> 1
+
+
+def _subsets(mask, count):
+    # Bitboards of every set of count squares within mask
+    squares = [1 << s for s in range(32) if mask >> s & 1]
+    for chosen in combinations(squares, count):
+        yield sum(chosen)
+
+
+def _solve(signature, solved):
+    # Stored bytes of every index of signature; solved maps each signature a capture or
+    # promotion can lead to onto its bytes
+    size = signature_size(signature)
+    num_men1, num_kings1, num_men2, num_kings2 = signature
+    valid = np.zeros(size, dtype=bool)
+    has_moves = np.zeros(size, dtype=bool)
+    # Moves leaving the signature: the fastest win and slowest loss they give, and whether
+    # one escapes to a draw or win (so the position cannot be lost)
+    exit_win = np.full(size, 0xFFFF, dtype=np.uint16)
+    exit_loss = np.zeros(size, dtype=np.uint8)
+    escape = np.zeros(size, dtype=bool)
+    sources = array('i')
+    targets = array('i')
+    board = Board()
+    for men1 in _subsets(_MEN_SQUARES[1], num_men1):
+        for kings1 in _subsets(MASK_32 ^ men1, num_kings1):
+            occupied = men1 | kings1
+            for men2 in _subsets(_MEN_SQUARES[2] & ~occupied, num_men2):
+                for kings2 in _subsets(MASK_32 & ~(occupied | men2), num_kings2):
+                    pieces = [0, men1 | kings1, men2 | kings2]
+                    kings = kings1 | kings2
+                    board.pieces = pieces
+                    board.kings = kings
+                    for player in (1, 2):
+                        index = position_index(signature, men1, kings1, men2, kings2, player)
+                        valid[index] = True
+                        moves = board._generate_moves(player)
+                        if not moves:
+                            continue
+                        has_moves[index] = True
+                        for from_row, from_col, to_row, to_col, captures in moves:
+                            src = 1 << RC_TO_SQUARE[from_row][from_col]
+                            dst = 1 << RC_TO_SQUARE[to_row][to_col]
+                            captured = 0
+                            for row, col in captures:
+                                captured |= 1 << RC_TO_SQUARE[row][col]
+                            own = pieces[player] ^ src ^ dst
+                            opp = pieces[3 - player] & ~captured
+                            new_kings = kings & ~captured
+                            promoted = False
+                            if kings & src:
+                                new_kings ^= src | dst
+                            elif to_row == CROWN_ROW[player]:
+                                new_kings |= dst
+                                promoted = True
+                            p1, p2 = (own, opp) if player == 1 else (opp, own)
+                            if not captured and not promoted:
+                                sources.append(index)
+                                targets.append(position_index(signature, p1 & ~new_kings, p1 & new_kings,
+                                                              p2 & ~new_kings, p2 & new_kings, 3 - player))
+                                continue
+                            if not opp:
+                                exit_win[index] = 1  # Took the last piece
+                                escape[index] = True
+                                continue
+                            parts = (p1 & ~new_kings, p1 & new_kings, p2 & ~new_kings, p2 & new_kings)
+                            target_signature = tuple(bin(part).count('1') for part in parts)
+                            result, distance = _decode(int(solved[target_signature][
+                                position_index(target_signature, *parts, 3 - player)]))
+                            if result == -1:
+                                exit_win[index] = min(int(exit_win[index]), distance + 1)
+                                escape[index] = True
+                            elif result == 0:
+                                escape[index] = True
+                            else:
+                                exit_loss[index] = max(int(exit_loss[index]), distance + 1)
+    sources = np.frombuffer(sources, dtype=np.int32)
+    targets = np.frombuffer(targets, dtype=np.int32)
+    internal = np.bincount(sources, minlength=size)
+
+    # Rounds of retrograde analysis: in round d, positions with a move to a loss in d - 1
+    # are wins in d, and positions whose moves all lead to wins (the last in d - 1) are
+    # losses in d. Positions never decided are draws.
+    result = np.zeros(size, dtype=np.int8)
+    distance = np.zeros(size, dtype=np.int32)
+    result[valid & ~has_moves] = -1
+    undecided = valid & has_moves
+    last_exit = int(max(exit_loss.max(initial=0), np.where(exit_win < 0xFFFF, exit_win, 0).max(initial=0)))
+    d = 0
+    while True:
+        d += 1
+        target_result = result[targets]
+        wins_found = np.bincount(sources, weights=(target_result == -1) & (distance[targets] == d - 1),
+                                 minlength=size) > 0
+        win = undecided & (wins_found | (exit_win == d))
+        won_targets = np.bincount(sources, weights=target_result == 1, minlength=size)
+        loss = undecided & ~win & ~escape & (won_targets == internal) & (exit_loss <= d)
+        changed = win | loss
+        result[win] = 1
+        result[loss] = -1
+        distance[changed] = d
+        undecided &= ~changed
+        if not changed.any() and d >= last_exit:
+            break
+
+    values = np.zeros(size, dtype=np.uint8)
+    capped = np.minimum(distance, MAX_DISTANCE).astype(np.uint8)
+    values[valid & (result == 1)] = 2 + 2 * capped[valid & (result == 1)]
+    values[valid & (result == -1)] = 3 + 2 * capped[valid & (result == -1)]
+    values[undecided] = DRAW
+    return values
+
+
+def build_tablebase(max_pieces, path=DEFAULT_PATH, verbose=True):
+    # Solves every signature with up to max_pieces pieces and writes the file to path
+    solved = {}
+    for signature in signatures(max_pieces):
+        start = time.perf_counter()
+        values = _solve(signature, solved)
+        solved[signature] = values
+        if verbose:
+            counts = np.bincount(values, minlength=256)
+            wins, losses = counts[2::2].sum(), counts[3::2].sum()
+            print(f'{signature}: {wins} wins, {losses} losses, {counts[DRAW]} draws'
+                  f' ({time.perf_counter() - start:.1f}s)')
+    offset = _HEADER.size + _ENTRY.size * len(solved)
+    header = [_HEADER.pack(MAGIC, VERSION, max_pieces, len(solved))]
+    for signature, values in solved.items():
+        header.append(_ENTRY.pack(*signature, offset, len(values)))
+        offset += len(values)
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    # Write then rename, so processes probing the old file never see a partial one
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(b''.join(header))
+        for values in solved.values():
+            f.write(values.tobytes())
+    os.replace(tmp_path, path)
+
+
+class Tablebase:
+    # Read-only view of a tablebase file. Pickles as its path, so worker processes map the
+    # file themselves.
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        self.data = np.memmap(path, dtype=np.uint8, mode='r')
+        magic, version, self.max_pieces, count = _HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f'{path} is not a version {VERSION} tablebase')
+        self.offsets = {}
+        for i in range(count):
+            *signature, offset, _ = _ENTRY.unpack_from(self.data, _HEADER.size + i * _ENTRY.size)
+            self.offsets[tuple(signature)] = offset
+        self.probes = 0
+        self.hits = 0
+
+    def __reduce__(self):
+        return (Tablebase, (self.path,))
+
+    def probe(self, board, player):
+        # (result, distance) with player to move: result 1, 0 or -1 for a win, draw or loss
+        # in distance plies with best play. None if the position is not in the tablebase.
+        counts = board.counts
+        if counts[1] + counts[2] + counts[3] + counts[4] > self.max_pieces:
+            return None
+        self.probes += 1
+        if not counts[player] + counts[player + 2]:
+            result = (-1, 0)
+        elif not counts[3 - player] + counts[5 - player]:
+            result = (1, 0)
+        else:
+            signature = (counts[1], counts[3], counts[2], counts[4])
+            offset = self.offsets.get(signature)
+            if offset is None:
+                return None
+            kings = board.kings
+            p1, p2 = board.pieces[1], board.pieces[2]
+            index = position_index(signature, p1 & ~kings, p1 & kings, p2 & ~kings, p2 & kings, player)
+            result = _decode(int(self.data[offset + index]))
+        self.hits += 1
+        return result
+
+    def best_move(self, board, player, legal_moves):
+        # The move leading to the fastest win, else a draw, else the slowest loss; None unless
+        # the position after every move is in the tablebase
+        best_move, best_key = None, None
+        for move in legal_moves:
+            undo = board.apply_move(move)
+            known = self.probe(board, 3 - player)
+            board.undo_move(undo)
+            if known is None:
+                return None
+            result, distance = -known[0], known[1]
+            key = (result, -distance if result > 0 else distance)
+            if best_key is None or key > best_key:
+                best_move, best_key = move, key
+        return best_move
+
+
+_tablebases = {}
+
+
+def load_tablebase(path=DEFAULT_PATH):
+    # The Tablebase at path, opened once per process; None if there is no such file
+    if path not in _tablebases:
+        _tablebases[path] = Tablebase(path) if os.path.exists(path) else None
+    return _tablebases[path]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Build an endgame tablebase by retrograde analysis')
+    parser.add_argument('--pieces', type=int, default=3,
+                        help='Largest number of pieces on the board (4 takes tens of minutes)')
+    parser.add_argument('--output', default=DEFAULT_PATH, help='Tablebase file to write')
+    args = parser.parse_args(argv)
+    if args.pieces < 2:
+        parser.error('--pieces must be at least 2')
+    build_tablebase(args.pieces, args.output)
+    print(f'Wrote {args.output} ({os.path.getsize(args.output)} bytes)')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
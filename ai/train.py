@@ -14,6 +14,7 @@ from ai.game_analysis import GameAnalyzer, record_training_metrics, plot_trainin
 from ai.experience_buffer import ExperienceReplayBuffer
 from ai.human_game_loader import HumanGameLoader
 from checkers.game import CheckersGame
+from checkers.board import enable_move_cache
 
 HALL_OF_FAME_SIZE = 5
 
@@ -64,8 +65,8 @@ def run_neat_dual(config_file, generations=50, enable_analysis=True):
         start_time = datetime.now()
 
         # Evaluate all pairs by self-play against hall of fame
-        # Parallelized evaluation
-        with concurrent.futures.ProcessPoolExecutor() as executor:
+        # Parallelized evaluation; each worker keeps its own legal-move cache across tasks
+        with concurrent.futures.ProcessPoolExecutor(initializer=enable_move_cache) as executor:
             evaluate_selfplay(pop_policy.population, pop_value.population, config_policy, config_value, hall_of_fame, games_per_genome=3, mcts_simulations=50, executor=executor)
 
         # Get best genomes
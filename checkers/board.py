@@ -1,85 +1,429 @@
+import random
+from collections import OrderedDict
 import numpy as np
 
+# Bitboard layout: the 32 playable (dark) squares are numbered 0..31 in
+# row-major order, four per row. Even rows hold columns 1, 3, 5, 7 and odd
+# rows hold columns 0, 2, 4, 6, so square s sits at (s // 4, 2 * (s % 4) + 1 - (s // 4) % 2).
+SQUARE_TO_RC = tuple((s // 4, 2 * (s % 4) + 1 - (s // 4) % 2) for s in range(32))
+RC_TO_SQUARE = tuple(
+    tuple(r * 4 + c // 2 if (r + c) % 2 == 1 else -1 for c in range(8)) for r in range(8)
+)
+
+SQUARE_ROWS = np.array([r for r, _ in SQUARE_TO_RC])
+SQUARE_COLS = np.array([c for _, c in SQUARE_TO_RC])
+
+MASK_32 = 0xFFFFFFFF
+EVEN_ROWS = sum(1 << s for s in range(32) if (s // 4) % 2 == 0)
+ODD_ROWS = MASK_32 ^ EVEN_ROWS
+LEFT_EDGE = sum(1 << s for s in range(32) if SQUARE_TO_RC[s][1] == 0)
+RIGHT_EDGE = sum(1 << s for s in range(32) if SQUARE_TO_RC[s][1] == 7)
+
+# Directions as (d_row, d_col); player 1 moves up the board, player 2 down.
+DIRECTIONS = ((-1, -1), (-1, 1), (1, -1), (1, 1))
+FORWARD_DIRS = {1: (0, 1), 2: (2, 3)}
+KING_DIRS = (0, 1, 2, 3)
+
+# Per-square neighbour and jump-landing tables, -1 when off the board.
+NEIGHBOR = tuple(
+    tuple(
+        RC_TO_SQUARE[r + dr][c + dc] if 0 <= r + dr < 8 and 0 <= c + dc < 8 else -1
+        for (r, c) in SQUARE_TO_RC
+    )
+    for (dr, dc) in DIRECTIONS
+)
+JUMP = tuple(
+    tuple(
+        RC_TO_SQUARE[r + 2 * dr][c + 2 * dc] if 0 <= r + 2 * dr < 8 and 0 <= c + 2 * dc < 8 else -1
+        for (r, c) in SQUARE_TO_RC
+    )
+    for (dr, dc) in DIRECTIONS
+)
+
+# Row the men of each player are crowned on.
+CROWN_ROW = {1: 0, 2: 7}
+
+# Jump tables for the capture search: per square, the (over_bit, over_rc, land_square, land_bit)
+# of every jump available to a king, and to the men of each player.
+KING_JUMPS = tuple(
+    tuple(
+        (1 << NEIGHBOR[d][s], SQUARE_TO_RC[NEIGHBOR[d][s]], JUMP[d][s], 1 << JUMP[d][s])
+        for d in KING_DIRS if JUMP[d][s] >= 0
+    )
+    for s in range(32)
+)
+MAN_JUMPS = {
+    player: tuple(
+        tuple(
+            (1 << NEIGHBOR[d][s], SQUARE_TO_RC[NEIGHBOR[d][s]], JUMP[d][s], 1 << JUMP[d][s])
+            for d in dirs if JUMP[d][s] >= 0
+        )
+        for s in range(32)
+    )
+    for player, dirs in FORWARD_DIRS.items()
+}
+
+# Zobrist keys: one 64-bit key per (piece value, square), plus one xor-ed in when player 2
+# is to move. Seeded so hashes are stable across processes and runs.
+_zobrist_rng = random.Random(0x5EED)
+ZOBRIST_PIECE = tuple(
+    tuple(_zobrist_rng.getrandbits(64) for _ in range(32)) if value else (0,) * 32
+    for value in range(5)
+)
+ZOBRIST_SIDE = _zobrist_rng.getrandbits(64)
+
+
+class MoveCache:
+    # Size-bounded LRU cache of generated move lists, keyed by (position hash, player).
+    # Entries keep the exact bitboards so a hash collision is treated as a miss.
+    def __init__(self, maxsize=50000):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def lookup(self, board, player):
+        key = (board.hash, player)
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == (board.pieces[1], board.pieces[2], board.kings):
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+        self.misses += 1
+        return None
+
+    def store(self, board, player, moves):
+        self._entries[(board.hash, player)] = ((board.pieces[1], board.pieces[2], board.kings), moves)
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+            'size': len(self._entries),
+        }
+
+
+# Process-wide move cache, off unless enable_move_cache is called. Each worker process of a
+# ProcessPoolExecutor gets its own copy that lives across the tasks it runs, e.g. by passing
+# enable_move_cache as the executor's initializer.
+_move_cache = None
+
+
+def enable_move_cache(maxsize=50000):
+    global _move_cache
+    if _move_cache is None or _move_cache.maxsize != maxsize:
+        _move_cache = MoveCache(maxsize)
+    return _move_cache
+
+
+def disable_move_cache():
+    global _move_cache
+    _move_cache = None
+
+
+def get_move_cache():
+    return _move_cache
+
+
+def shift_squares(bb, d):
+    # Shift every set square one step in direction d, dropping squares that fall off the board
+    if d == 0:
+        return ((bb & EVEN_ROWS) >> 4) | ((bb & ODD_ROWS & ~LEFT_EDGE) >> 5)
+    if d == 1:
+        return ((bb & EVEN_ROWS & ~RIGHT_EDGE) >> 3) | ((bb & ODD_ROWS) >> 4)
+    if d == 2:
+        return (((bb & EVEN_ROWS) << 4) | ((bb & ODD_ROWS & ~LEFT_EDGE) << 3)) & MASK_32
+    return (((bb & EVEN_ROWS & ~RIGHT_EDGE) << 5) | ((bb & ODD_ROWS) << 4)) & MASK_32
+
+
+def jump_chains(square, table, crown_row, opp, empty, with_path=True):
+    # Every complete jump sequence from square, by depth-first search over a jump table:
+    # KING_JUMPS (crown_row -1) or MAN_JUMPS[player] (crown_row CROWN_ROW[player]). empty must
+    # include square itself. Returns a list of (landing square, captured bitboard, captured
+    # (row, col) in jump order, or None without with_path); a chain ends when no further jump
+    # exists or when a man reaches its crowning row. Shared by Board's move generator and
+    # ai.rollout.
+    chains = []
+    _extend_chains(square, table, crown_row, opp, empty, 0, [] if with_path else None, chains)
+    return chains
+
+
+def _extend_chains(square, table, crown_row, opp, empty, captured, path, chains):
+    extended = False
+    for over_bit, over_rc, land, land_bit in table[square]:
+        if opp & over_bit and not captured & over_bit and empty & land_bit:
+            extended = True
+            if path is not None:
+                path.append(over_rc)
+            if land // 4 == crown_row:
+                chains.append((land, captured | over_bit, list(path) if path is not None else None))
+            else:
+                _extend_chains(land, table, crown_row, opp, empty, captured | over_bit, path, chains)
+            if path is not None:
+                path.pop()
+    if not extended and captured:
+        chains.append((square, captured, list(path) if path is not None else None))
+
+
 class Board:
+    # Compact board: three bitboards plus incrementally kept counts and hash. Copies and
+    # pickles carry no per-square arrays; the 8x8 .board view is built on demand.
+    __slots__ = ('pieces', 'kings', 'counts', 'hash', '_array')
+
     def __init__(self):
         self.reset()
 
     def reset(self):
         # 8x8 board: 0=empty, 1=player1, 2=player2, 3=player1 king, 4=player2 king
-        self.board = np.zeros((8, 8), dtype=int)
-        # Place pieces for both players
-        for row in range(3):
-            for col in range(8):
-                if (row + col) % 2 == 1:
-                    self.board[row, col] = 2
-        for row in range(5, 8):
-            for col in range(8):
-                if (row + col) % 2 == 1:
-                    self.board[row, col] = 1
+        # Stored as bitboards: pieces[player] holds every piece of that side, kings holds all kings
+        self.pieces = [0, 0xFFF00000, 0x00000FFF]
+        self.kings = 0
+        # counts[value] is the number of pieces of each value, kept up to date as pieces move
+        self.counts = [0, 12, 12, 0, 0]
+        # Zobrist hash of the piece placement, updated incrementally by _place
+        self.hash = 0
+        for square in range(32):
+            if square < 12:
+                self.hash ^= ZOBRIST_PIECE[2][square]
+            elif square >= 20:
+                self.hash ^= ZOBRIST_PIECE[1][square]
+        self._array = None
+
+    @classmethod
+    def from_squares(cls, squares):
+        new_board = cls.__new__(cls)
+        new_board.squares = squares
+        return new_board
+
+    @property
+    def squares(self):
+        # 32-entry int8 array of piece values over the playable squares (SQUARE_TO_RC order)
+        squares = np.zeros(32, dtype=np.int8)
+        for value in (1, 2, 3, 4):
+            bb = self._bitboard(value)
+            while bb:
+                low = bb & -bb
+                squares[low.bit_length() - 1] = value
+                bb ^= low
+        return squares
+
+    @squares.setter
+    def squares(self, squares):
+        self.pieces = [0, 0, 0]
+        self.kings = 0
+        self.counts = [0, 0, 0, 0, 0]
+        self.hash = 0
+        self._array = None
+        for square, value in enumerate(squares):
+            if value:
+                self._place(square, int(value))
+
+    @property
+    def board(self):
+        # Read-only 8x8 view for callers that index the board as an array
+        if self._array is None:
+            arr = np.zeros((8, 8), dtype=np.int8)
+            arr[SQUARE_ROWS, SQUARE_COLS] = self.squares
+            arr.flags.writeable = False
+            self._array = arr
+        return self._array
+
+    @board.setter
+    def board(self, arr):
+        self.squares = np.asarray(arr)[SQUARE_ROWS, SQUARE_COLS]
+
+    def __getstate__(self):
+        return (self.pieces[1], self.pieces[2], self.kings, tuple(self.counts), self.hash)
+
+    def __setstate__(self, state):
+        p1, p2, self.kings, counts, self.hash = state
+        self.pieces = [0, p1, p2]
+        self.counts = list(counts)
+        self._array = None
+
+    def _bitboard(self, value):
+        if value in (1, 2):
+            return self.pieces[value] & ~self.kings
+        return self.pieces[value - 2] & self.kings
+
+    def _value_at(self, bit):
+        if self.pieces[1] & bit:
+            return 3 if self.kings & bit else 1
+        if self.pieces[2] & bit:
+            return 4 if self.kings & bit else 2
+        return 0
+
+    def _place(self, square, value):
+        bit = 1 << square
+        old = self._value_at(bit)
+        if old:
+            self.counts[old] -= 1
+            self.hash ^= ZOBRIST_PIECE[old][square]
+            self.pieces[2 - old % 2] &= ~bit
+            self.kings &= ~bit
+        if value:
+            self.counts[value] += 1
+            self.hash ^= ZOBRIST_PIECE[value][square]
+            self.pieces[2 - value % 2] |= bit
+            if value > 2:
+                self.kings |= bit
 
     def get_piece(self, row, col):
-        return self.board[row, col]
+        square = RC_TO_SQUARE[row][col]
+        if square < 0:
+            return 0
+        return self._value_at(1 << square)
 
     def set_piece(self, row, col, value):
-        self.board[row, col] = value
+        square = RC_TO_SQUARE[row][col]
+        if square < 0:
+            if value:
+                raise ValueError(f"({row}, {col}) is not a playable square")
+            return
+        self._place(square, value)
+        self._array = None
+
+    def apply_move(self, move):
+        # Plays a (from_row, from_col, to_row, to_col, [captures]) move, crowning men that reach
+        # the far row. Returns an undo record for undo_move.
+        from_row, from_col, to_row, to_col, captures = move
+        src = RC_TO_SQUARE[from_row][from_col]
+        dst = RC_TO_SQUARE[to_row][to_col]
+        piece = self._value_at(1 << src)
+        captured = tuple((RC_TO_SQUARE[r][c], self._value_at(1 << RC_TO_SQUARE[r][c])) for r, c in captures)
+        self._place(src, 0)
+        for square, _ in captured:
+            self._place(square, 0)
+        if piece <= 2 and to_row == CROWN_ROW[piece]:
+            self._place(dst, piece + 2)
+        else:
+            self._place(dst, piece)
+        self._array = None
+        return (src, dst, piece, captured)
+
+    def undo_move(self, undo):
+        # Restores the position from before apply_move returned this record
+        src, dst, piece, captured = undo
+        self._place(dst, 0)
+        for square, value in captured:
+            self._place(square, value)
+        self._place(src, piece)
+        self._array = None
 
     def copy(self):
-        new_board = Board()
-        new_board.board = self.board.copy()
+        new_board = Board.__new__(Board)
+        new_board.pieces = list(self.pieces)
+        new_board.kings = self.kings
+        new_board.counts = list(self.counts)
+        new_board.hash = self.hash
+        new_board._array = self._array
         return new_board
 
     def get_legal_moves(self, player):
         # Returns a list of (from_row, from_col, to_row, to_col, [captures])
-        # Standard American Checkers rules
-        directions = {
-            1: [(-1, -1), (-1, 1)],  # Player 1 moves up
-            2: [(1, -1), (1, 1)],    # Player 2 moves down
-            3: [(-1, -1), (-1, 1), (1, -1), (1, 1)],  # King
-            4: [(-1, -1), (-1, 1), (1, -1), (1, 1)],
-        }
+        cache = _move_cache
+        if cache is None:
+            return self._generate_moves(player)
+        moves = cache.lookup(self, player)
+        if moves is None:
+            moves = tuple(self._generate_moves(player))
+            cache.store(self, player, moves)
+        return list(moves)
+
+    def _generate_moves(self, player):
+        # Standard American Checkers rules: captures are mandatory and a capture move is the
+        # complete jump sequence, listing every captured square in order
+        own = self.pieces[player]
+        opp = self.pieces[3 - player]
+        empty = ~(own | opp) & MASK_32
+        kings = own & self.kings
+        forward = FORWARD_DIRS[player]
         moves = []
-        captures = []
-        for row in range(8):
-            for col in range(8):
-                piece = self.get_piece(row, col)
-                if (player == 1 and piece in [1, 3]) or (player == 2 and piece in [2, 4]):
-                    dirs = directions[piece]
-                    for dr, dc in dirs:
-                        r, c = row + dr, col + dc
-                        # Normal move
-                        if 0 <= r < 8 and 0 <= c < 8 and self.get_piece(r, c) == 0:
-                            moves.append((row, col, r, c, []))
-                        # Capture
-                        r2, c2 = row + 2 * dr, col + 2 * dc
-                        if 0 <= r2 < 8 and 0 <= c2 < 8 and self.get_piece(r2, c2) == 0:
-                            opponent = 2 if player == 1 else 1
-                            opponent_k = 4 if player == 1 else 3
-                            if self.get_piece(r, c) in [opponent, opponent_k]:
-                                captures.append((row, col, r2, c2, [(r, c)]))
-        return captures if captures else moves
-
-    def is_game_over(self):
-        # Game is over if either player has no pieces or no legal moves
-        p1_pieces, p2_pieces = 0, 0
-        for row in range(8):
-            for col in range(8):
-                piece = self.get_piece(row, col)
-                if piece in [1, 3]:
-                    p1_pieces += 1
-                elif piece in [2, 4]:
-                    p2_pieces += 1
-        if p1_pieces == 0 or p2_pieces == 0:
-            return True
-        if not self.get_legal_moves(1) and not self.get_legal_moves(2):
-            return True
+        # Each direction: squares that can move there are found by stepping the empty set back
+        targets = []
+        jumpers = 0
+        for d in KING_DIRS:
+            movers = own if d in forward else kings
+            if movers:
+                back = 3 - d
+                open_back = shift_squares(empty, back)
+                targets.append((d, movers, open_back))
+                victims = opp & open_back
+                if victims:
+                    jumpers |= movers & shift_squares(victims, back)
+        if jumpers:
+            crown_row = CROWN_ROW[player]
+            while jumpers:
+                low = jumpers & -jumpers
+                s = low.bit_length() - 1
+                if kings & low:
+                    # A king can reach the same square over the same pieces in a different order
+                    seen = set()
+                    for land, captured, path in jump_chains(s, KING_JUMPS, -1, opp, empty | low):
+                        if (land, captured) not in seen:
+                            seen.add((land, captured))
+                            moves.append(SQUARE_TO_RC[s] + SQUARE_TO_RC[land] + (path,))
+                else:
+                    for land, _, path in jump_chains(s, MAN_JUMPS[player], crown_row, opp, empty | low):
+                        moves.append(SQUARE_TO_RC[s] + SQUARE_TO_RC[land] + (path,))
+                jumpers ^= low
+        else:
+            for d, movers, open_back in targets:
+                steppers = movers & open_back
+                neighbor = NEIGHBOR[d]
+                while steppers:
+                    low = steppers & -steppers
+                    s = low.bit_length() - 1
+                    moves.append(SQUARE_TO_RC[s] + SQUARE_TO_RC[neighbor[s]] + ([],))
+                    steppers ^= low
+        # Keep the historical ordering (by origin square, then destination)
+        moves.sort()
+        return moves
+
+    def has_legal_moves(self, player):
+        own = self.pieces[player]
+        opp = self.pieces[3 - player]
+        empty = ~(own | opp) & MASK_32
+        kings = own & self.kings
+        forward = FORWARD_DIRS[player]
+        for d in KING_DIRS:
+            movers = own if d in forward else kings
+            if movers:
+                back = 3 - d
+                open_back = shift_squares(empty, back)
+                if movers & open_back or movers & shift_squares(opp & open_back, back):
+                    return True
         return False
 
+    def count_pieces(self, player):
+        return self.counts[player] + self.counts[player + 2]
+
+    def count_men(self, player):
+        return self.counts[player]
+
+    def count_kings(self, player):
+        return self.counts[player + 2]
+
+    def is_game_over(self, player):
+        # Game is over when player, the side to move, has no pieces or no legal moves:
+        # the same rule as CheckersGame.get_status
+        return not self.has_legal_moves(player)
+
     def __str__(self):
         # Simple text display
         symbols = {0: '.', 1: 'r', 2: 'b', 3: 'R', 4: 'B'}
         s = ''
         for row in range(8):
             for col in range(8):
-                s += symbols[self.board[row, col]] + ' '
+                s += symbols[self.get_piece(row, col)] + ' '
             s += '\n'
         return s
@@ -1,83 +1,74 @@
-from .board import Board
+from .board import Board, ZOBRIST_SIDE
 
 class CheckersGame:
     def __init__(self):
         self.board = Board()
         self.current_player = 1
         self.history = []
+        # Legal moves and winner of the last position queried, see get_status
+        self._status_key = None
+        self._status = None
 
     def reset(self):
         self.board.reset()
         self.current_player = 1
         self.history = []
+        self._status_key = None
+        self._status = None
+
+    @property
+    def hash(self):
+        # 64-bit Zobrist hash of the position including the side to move
+        return self.board.hash ^ ZOBRIST_SIDE if self.current_player == 2 else self.board.hash
 
     def get_legal_moves(self, player=None):
-        # Placeholder: implement full move generation logic
-        # Should return list of moves [(from_row, from_col, to_row, to_col, [captures])]
-        return self.board.get_legal_moves(player or self.current_player)
+        # Returns list of moves [(from_row, from_col, to_row, to_col, [captures])]
+        if player is None or player == self.current_player:
+            return list(self.get_status()[0])
+        return self.board.get_legal_moves(player)
+
+    def get_status(self):
+        # Returns (legal_moves, winner) for the side to move, computed once per position.
+        # legal_moves is a shared tuple: copy it before mutating. winner is None while
+        # the game is in progress; a side with no pieces or no legal moves has lost.
+        key = (self.board.pieces[1], self.board.pieces[2], self.board.kings, self.current_player)
+        if key != self._status_key:
+            moves = tuple(self.board.get_legal_moves(self.current_player))
+            winner = None if moves else 3 - self.current_player
+            self._status = (moves, winner)
+            self._status_key = key
+        return self._status
 
     def make_move(self, move):
-        # move: (from_row, from_col, to_row, to_col, [captures])
-        from_row, from_col, to_row, to_col, captures = move
-        piece = self.board.get_piece(from_row, from_col)
-        self.board.set_piece(from_row, from_col, 0)
-        self.board.set_piece(to_row, to_col, piece)
-        # Remove captured pieces
-        for r, c in captures:
-            self.board.set_piece(r, c, 0)
-        # Kinging
-        if piece == 1 and to_row == 0:
-            self.board.set_piece(to_row, to_col, 3)
-        elif piece == 2 and to_row == 7:
-            self.board.set_piece(to_row, to_col, 4)
-        # Switch player if no multi-capture available
-        if captures:
-            # Check if another capture is possible from new position
-            new_moves = self.board.get_legal_moves(self.current_player)
-            further_capture = False
-            for nm in new_moves:
-                if nm[0] == to_row and nm[1] == to_col and nm[4]:
-                    further_capture = True
-                    break
-            if further_capture:
-                # Multi-capture: same player moves again
-                pass
-            else:
-                self.current_player = 2 if self.current_player == 1 else 1
-        else:
-            self.current_player = 2 if self.current_player == 1 else 1
+        # move: (from_row, from_col, to_row, to_col, [captures]); captures lists every
+        # piece taken by a multi-jump. Capture moves are complete jump sequences, so the
+        # turn always passes. Returns an undo record for unmake_move.
+        undo = (self.board.apply_move(move), self.current_player, self._status_key, self._status)
+        self.current_player = 2 if self.current_player == 1 else 1
         self.history.append(move)
+        return undo
+
+    def unmake_move(self, undo):
+        # Takes back the last move made, restoring the board, side to move and captured pieces
+        board_undo, self.current_player, self._status_key, self._status = undo
+        self.board.undo_move(board_undo)
+        self.history.pop()
+
+    def copy(self):
+        new_game = CheckersGame.__new__(CheckersGame)
+        new_game.board = self.board.copy()
+        new_game.current_player = self.current_player
+        new_game.history = list(self.history)
+        new_game._status_key = self._status_key
+        new_game._status = self._status
+        return new_game
 
     def is_game_over(self):
-        # Placeholder: implement end condition
-        return self.board.is_game_over()
+        return self.get_status()[1] is not None
 
     def get_winner(self):
-        # Returns 1 if player 1 wins, 2 if player 2 wins, 0 for draw, None if not over
-        p1_pieces, p2_pieces = 0, 0
-        for row in range(8):
-            for col in range(8):
-                piece = self.board.get_piece(row, col)
-                if piece in [1, 3]:
-                    p1_pieces += 1
-                elif piece in [2, 4]:
-                    p2_pieces += 1
-        if p1_pieces == 0 and p2_pieces == 0:
-            return 0
-        if p1_pieces == 0:
-            return 2
-        if p2_pieces == 0:
-            return 1
-        # Check for legal moves
-        p1_moves = self.board.get_legal_moves(1)
-        p2_moves = self.board.get_legal_moves(2)
-        if not p1_moves and not p2_moves:
-            return 0
-        if not p1_moves:
-            return 2
-        if not p2_moves:
-            return 1
-        return None
+        # Returns 1 if player 1 wins, 2 if player 2 wins, None if not over
+        return self.get_status()[1]
 
     def get_state(self):
         # Returns a flattened board and current player
@@ -0,0 +1,151 @@
+"""
+Perft: counts the leaf nodes of the move tree to a fixed depth.
+
+Used to benchmark the move generator and to check it against reference
+counts. Run `python -m checkers.perft` for a benchmark from the starting
+position, or `python -m checkers.perft --verify` to check every reference
+position (exits with status 1 on a mismatch).
+"""
+import argparse
+import sys
+import time
+from .game import CheckersGame
+
+SYMBOLS = {'.': 0, 'r': 1, 'b': 2, 'R': 3, 'B': 4}
+
+# Reference positions: (name, rows as printed by Board.__str__, side to move, {depth: leaf count}).
+# The starting-position counts are the published English draughts perft numbers; the others
+# come from an independent 8x8-array move generator. Jump sequences that reach the same square
+# over the same pieces count once, and a man that is crowned ends its move.
+POSITIONS = [
+    ('start', None, 1, {
+        1: 7, 2: 49, 3: 302, 4: 1469, 5: 7361, 6: 36768, 7: 179740, 8: 845931, 9: 3963680,
+        10: 18391564,
+    }),
+    ('promotions', [
+        '. . . . . . . .',
+        'r . . . . . r .',
+        '. . . b . . . .',
+        '. . B . . . . .',
+        '. . . . . R . .',
+        '. . . . . . . .',
+        '. b . . . . . b',
+        '. . . . . . . .',
+    ], 1, {1: 7, 2: 43, 3: 267, 4: 1880, 5: 11227, 6: 81063}),
+    ('multi_jump', [
+        '. . . . . b . b',
+        '. . b . b . . .',
+        '. . . . . . . .',
+        '. . b . b . . .',
+        '. . . . . . . .',
+        '. . b . . . b .',
+        '. r . . . r . .',
+        '. . r . . . r .',
+    ], 1, {1: 3, 2: 3, 3: 7, 4: 55, 5: 258, 6: 1820}),
+    ('king_ring', [
+        '. . . . . . . .',
+        '. . . . . . . .',
+        '. . . R . . . .',
+        '. . b . b . . .',
+        '. . . . . . . .',
+        '. . b . b . . .',
+        '. r . . . . . .',
+        'B . . . . . . .',
+    ], 1, {1: 3, 2: 11, 3: 34, 4: 140, 5: 634, 6: 3071}),
+    ('crowning_ends_move', [
+        '. . . . . . . .',
+        '. . b . b . . .',
+        '. r . . . . . .',
+        '. . . . . . . .',
+        '. . . . . . . .',
+        '. . . . . . b .',
+        '. . . r . r . .',
+        '. . . . . . . .',
+    ], 1, {1: 2, 2: 2, 3: 4, 4: 10, 5: 29, 6: 81}),
+]
+
+
+def load_position(rows, player=1):
+    # Builds a CheckersGame from rows like those printed by Board.__str__
+    game = CheckersGame()
+    if rows is not None:
+        cells = [[SYMBOLS[cell] for cell in row.split()] for row in rows]
+        for r, row in enumerate(cells):
+            for c, value in enumerate(row):
+                if value and (r + c) % 2 == 0:
+                    raise ValueError(f"Piece on unplayable square ({r}, {c})")
+        game.board.board = cells
+    game.current_player = player
+    return game
+
+
+def perft(game, depth):
+    # Number of leaf nodes depth plies below the current position (played in place with undo)
+    moves = game.get_status()[0]
+    if depth <= 1:
+        return len(moves) if depth == 1 else 1
+    nodes = 0
+    for move in moves:
+        undo = game.make_move(move)
+        nodes += perft(game, depth - 1)
+        game.unmake_move(undo)
+    return nodes
+
+
+def divide(game, depth):
+    # Leaf counts per root move, for narrowing down which move a count mismatch comes from
+    counts = []
+    for move in game.get_status()[0]:
+        undo = game.make_move(move)
+        counts.append((move, perft(game, depth - 1)))
+        game.unmake_move(undo)
+    return counts
+
+
+def run(name, rows, player, depth):
+    game = load_position(rows, player)
+    start = time.perf_counter()
+    nodes = perft(game, depth)
+    elapsed = time.perf_counter() - start
+    return nodes, elapsed
+
+
+def verify(max_depth=6, out=sys.stdout):
+    # Checks every reference position up to max_depth; returns True when all counts match
+    ok = True
+    for name, rows, player, reference in POSITIONS:
+        for depth in sorted(d for d in reference if d <= max_depth):
+            nodes, elapsed = run(name, rows, player, depth)
+            status = 'ok' if nodes == reference[depth] else f'MISMATCH (expected {reference[depth]})'
+            ok &= nodes == reference[depth]
+            nps = nodes / elapsed if elapsed > 0 else float('inf')
+            print(f'{name:20s} depth {depth:2d}: {nodes:10d} nodes {nps:12.0f} nodes/s  {status}', file=out)
+    return ok
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Perft benchmark and move generator check')
+    parser.add_argument('--depth', type=int, default=7, help='Depth for the starting-position benchmark')
+    parser.add_argument('--verify', action='store_true', help='Check all reference positions')
+    parser.add_argument('--max-depth', type=int, default=6, help='Deepest reference count checked by --verify')
+    parser.add_argument('--divide', action='store_true', help='Print per-move counts at the root')
+    args = parser.parse_args(argv)
+
+    if args.verify:
+        ok = verify(args.max_depth)
+        print('All perft counts match.' if ok else 'Perft mismatch!')
+        return 0 if ok else 1
+
+    game = load_position(None)
+    if args.divide:
+        for move, nodes in divide(game, args.depth):
+            print(f'{move[:4]} {nodes}')
+    for depth in range(1, args.depth + 1):
+        nodes, elapsed = run('start', None, 1, depth)
+        nps = nodes / elapsed if elapsed > 0 else float('inf')
+        print(f'depth {depth:2d}: {nodes:10d} nodes  {elapsed:8.3f}s  {nps:12.0f} nodes/s')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
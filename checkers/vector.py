@@ -0,0 +1,166 @@
+import numpy as np
+from .board import (Board, SQUARE_TO_RC, SQUARE_ROWS, SQUARE_COLS, RC_TO_SQUARE, NEIGHBOR, JUMP,
+                    FORWARD_DIRS, CROWN_ROW)
+
+# Square 32 is an off-board sentinel: lookups that fall off the board land there.
+OFF_BOARD = 32
+NEIGHBOR_IDX = np.array([[NEIGHBOR[d][s] if NEIGHBOR[d][s] >= 0 else OFF_BOARD for d in range(4)] for s in range(32)])
+JUMP_IDX = np.array([[JUMP[d][s] if JUMP[d][s] >= 0 else OFF_BOARD for d in range(4)] for s in range(32)])
+# FORWARD_MASK[player] marks the directions a man of that player may move in
+FORWARD_MASK = np.zeros((3, 4), dtype=bool)
+for _player, _dirs in FORWARD_DIRS.items():
+    FORWARD_MASK[_player, list(_dirs)] = True
+CROWN_SQUARE_ROW = np.array([-1, CROWN_ROW[1], CROWN_ROW[2]])
+
+# Marks a piece jumped earlier in the current jump sequence: it blocks its square and cannot
+# be jumped again, and is removed when the sequence ends.
+CAPTURED = 5
+NUM_ACTIONS = 128
+
+
+class VectorCheckers:
+    # Steps N games of checkers at once. Boards are an (N, 32) int8 array over the playable
+    # squares using the Board piece values (0=empty, 1/2=men, 3/4=kings).
+    #
+    # An action is from_square * 4 + direction (DIRECTIONS order), so every position has a
+    # (N, 128) legal-action mask. A capture is played one jump per action: while the jumping
+    # piece can continue, the same side stays to move and only that piece's jumps are legal.
+    def __init__(self, num_games, max_moves=100):
+        self.num_games = num_games
+        self.max_moves = max_moves
+        self.reset()
+
+    def reset(self):
+        self.boards = np.tile(Board().squares, (self.num_games, 1))
+        self.players = np.ones(self.num_games, dtype=np.int8)
+        self.pending = np.full(self.num_games, -1, dtype=np.int16)
+        self.move_counts = np.zeros(self.num_games, dtype=np.int32)
+        self.done = np.zeros(self.num_games, dtype=bool)
+        self.winners = np.zeros(self.num_games, dtype=np.int8)
+        self._refresh()
+
+    def load(self, index, game):
+        # Copy a CheckersGame position into slot index
+        self.boards[index] = game.board.squares
+        self.players[index] = game.current_player
+        self.pending[index] = -1
+        self.move_counts[index] = 0
+        self.done[index] = False
+        self.winners[index] = 0
+        self._refresh()
+
+    def _masks(self, boards, players, pending):
+        # Legal step and jump masks, (n, 32, 4) each, for the given games
+        n = len(boards)
+        padded = np.empty((n, 33), dtype=np.int8)
+        padded[:, :32] = boards
+        padded[:, 32] = -1
+        p = players[:, None].astype(np.int8)
+        own = (boards == p) | (boards == p + 2)
+        opp = (padded == 3 - p) | (padded == 5 - p)
+        empty = padded == 0
+        allowed = own[:, :, None] & ((boards >= 3)[:, :, None] | FORWARD_MASK[players][:, None, :])
+        steps = allowed & empty[:, NEIGHBOR_IDX]
+        jumps = allowed & opp[:, NEIGHBOR_IDX] & empty[:, JUMP_IDX]
+        continuing = pending >= 0
+        if continuing.any():
+            jumps[continuing] &= (np.arange(32) == pending[continuing, None])[:, :, None]
+        return steps, jumps
+
+    def _refresh(self):
+        steps, jumps = self._masks(self.boards, self.players, self.pending)
+        self.must_jump = jumps.any(axis=(1, 2))
+        mask = np.where(self.must_jump[:, None, None], jumps, steps).reshape(self.num_games, NUM_ACTIONS)
+        mask[self.done] = False
+        self._mask = mask
+        # Side to move has no legal action: it loses
+        stuck = ~self.done & ~mask.any(axis=1)
+        self.winners[stuck] = 3 - self.players[stuck]
+        self.done |= stuck
+
+    def legal_mask(self):
+        # (N, 128) bool mask of legal actions; all False for finished games
+        return self._mask
+
+    def step(self, actions):
+        # Apply one action per game (ignored for finished games).
+        # Returns (done, winners); winners is 0 for unfinished or drawn games.
+        actions = np.asarray(actions)
+        idx = np.flatnonzero(~self.done)
+        if len(idx) == 0:
+            return self.done, self.winners
+        act = actions[idx]
+        if not self._mask[idx, act].all():
+            raise ValueError("Illegal action for an unfinished game")
+        square, d = act // 4, act % 4
+        jump = self.must_jump[idx]
+        over = NEIGHBOR_IDX[square, d]
+        to = np.where(jump, JUMP_IDX[square, d], over)
+        piece = self.boards[idx, square]
+        self.boards[idx, square] = 0
+        self.boards[idx[jump], over[jump]] = CAPTURED
+        crowned = (piece <= 2) & (SQUARE_ROWS[to] == CROWN_SQUARE_ROW[piece.clip(0, 2)])
+        piece = np.where(crowned, piece + 2, piece)
+        self.boards[idx, to] = piece
+
+        # A jump continues while the piece (not just crowned) has another jump from its landing square
+        cont = jump & ~crowned
+        if cont.any():
+            ci = idx[cont]
+            pending = to[cont].astype(np.int16)
+            _, jumps = self._masks(self.boards[ci], self.players[ci], pending)
+            cont[cont] = jumps.any(axis=(1, 2))
+        self.pending[idx[cont]] = to[cont]
+
+        ended = idx[~cont]
+        self.pending[ended] = -1
+        rows = self.boards[ended]
+        rows[rows == CAPTURED] = 0
+        self.boards[ended] = rows
+        self.players[ended] = 3 - self.players[ended]
+        self.move_counts[ended] += 1
+        drawn = ended[self.move_counts[ended] >= self.max_moves]
+        self.done[drawn] = True
+        self._refresh()
+        return self.done, self.winners
+
+    def random_actions(self, rng=None):
+        # Uniformly random legal action per game, -1 for finished games
+        rng = rng if rng is not None else np.random.default_rng()
+        keys = rng.random((self.num_games, NUM_ACTIONS))
+        keys[~self._mask] = -1.0
+        actions = keys.argmax(axis=1)
+        actions[self.done] = -1
+        return actions
+
+    def piece_counts(self):
+        # (N, 3) array; column p holds the number of pieces of player p
+        counts = np.zeros((self.num_games, 3), dtype=np.int32)
+        counts[:, 1] = ((self.boards == 1) | (self.boards == 3)).sum(axis=1)
+        counts[:, 2] = ((self.boards == 2) | (self.boards == 4)).sum(axis=1)
+        return counts
+
+    def to_boards(self):
+        # (N, 8, 8) arrays in the Board.board layout, e.g. for agents that expect 8x8 input
+        full = np.zeros((self.num_games, 8, 8), dtype=int)
+        full[:, SQUARE_ROWS, SQUARE_COLS] = np.where(self.boards == CAPTURED, 0, self.boards)
+        return full
+
+    def decode_action(self, index, action):
+        # Returns (from_row, from_col, to_row, to_col) of the step or jump action plays in game index
+        square, d = divmod(int(action), 4)
+        to = JUMP[d][square] if self.must_jump[index] else NEIGHBOR[d][square]
+        return SQUARE_TO_RC[square] + SQUARE_TO_RC[to]
+
+    @staticmethod
+    def encode_action(from_row, from_col, d):
+        return RC_TO_SQUARE[from_row][from_col] * 4 + d
+
+
+def play_random_games(num_games, max_moves=100, seed=None):
+    # Plays num_games random-vs-random games side by side; returns the (N,) winners array
+    rng = np.random.default_rng(seed)
+    env = VectorCheckers(num_games, max_moves=max_moves)
+    while not env.done.all():
+        env.step(env.random_actions(rng))
+    return env.winners
@@ -1,12 +1,9 @@
-import pickle
 from checkers.game import CheckersGame
-from ai.agent import NEATAgent
+from ai.agent import NEATAgent, load_genome
 from ai.random_agent import RandomAgent
 import neat
 
 config_path = 'neat_config.txt'
-with open('best_genome.pkl', 'rb') as f:
-    genome = pickle.load(f)
 config = neat.Config(
     neat.DefaultGenome,
     neat.DefaultReproduction,
@@ -14,6 +11,7 @@ config = neat.Config(
     neat.DefaultStagnation,
     config_path
 )
+genome = load_genome('best_genome.pkl', config)
 
 agent1 = NEATAgent(genome, config, player=1)
 agent2 = RandomAgent(player=2)
@@ -1,12 +1,17 @@
 from flask import Flask, render_template_string, request, jsonify
 import numpy as np
 from checkers.game import CheckersGame
-from ai.agent import NEATAgent, ValueNEATAgent
+from ai.agent import NEATAgent, ValueNEATAgent, load_genome
 from ai.random_agent import RandomAgent
 from ai.mcts import MCTSAgent
+from ai.parallel_mcts import ParallelMCTSAgent
+from ai.lookahead_agent import ValueLookaheadAgent
+from ai.minimax_agent import MinimaxAgent
+from ai.tablebase import load_tablebase
+from ai.opening_book import load_opening_book
+from ai.codegen import load_network
 import neat
 import os
-import pickle
 
 app = Flask(__name__)
 
@@ -28,9 +33,14 @@ HTML_TEMPLATE = '''
     .R { background: #e74c3c; border: 3px solid gold; border-radius: 50%; width: 32px; height: 32px; }
     .B { background: #222; border: 3px solid gold; border-radius: 50%; width: 32px; height: 32px; }
     .selected { outline: 2px solid #27ae60; }
+    .can-select-dest { outline: 2px dashed #f1c40f; }
   </style>
   <script>
     let selected = null;
+    // Legal next landing squares of each piece ("row-col" keys), and the landings of a
+    // multi-jump taken so far
+    const nextLandings = {{ next_landings|tojson }};
+    const jumpPath = {{ jump_path|tojson }};
     function selectCell(row, col) {
       // Deselect previous
       if (selected) {
@@ -40,19 +50,16 @@ HTML_TEMPLATE = '''
       document.getElementById(selected).classList.add('selected');
       document.getElementById('from_row').value = row;
       document.getElementById('from_col').value = col;
-      // Enable only empty, dark cells as destination
+      // Enable only the piece's legal next landing squares as destination
       Array.from(document.getElementsByClassName('cell')).forEach(cell => {
         cell.classList.remove('can-select-dest');
       });
-      for (let r = 0; r < 8; r++) {
-        for (let c = 0; c < 8; c++) {
-          let cell = document.getElementById(`${r}-${c}`);
-          if (cell && cell.dataset.empty === "1" && (r+c)%2 === 1) {
-            cell.classList.add('can-select-dest');
-            cell.onclick = function() { setToCell(r, c); };
-          }
-        }
-      }
+      (nextLandings[selected] || []).forEach(id => {
+        let cell = document.getElementById(id);
+        let [r, c] = id.split('-').map(Number);
+        cell.classList.add('can-select-dest');
+        cell.onclick = function() { setToCell(r, c); };
+      });
     }
     function setToCell(row, col) {
       if (!selected) return; // Must select a piece first
@@ -67,12 +74,18 @@ HTML_TEMPLATE = '''
       });
       document.getElementById('moveForm').submit();
     }
-    // On page load, clear all hidden fields
+    // On page load, clear all hidden fields, unless a multi-jump is under way: then keep its
+    // piece selected, mark the squares it has landed on and offer the next hops
     window.onload = function() {
-      document.getElementById('from_row').value = '';
-      document.getElementById('from_col').value = '';
       document.getElementById('to_row').value = '';
       document.getElementById('to_col').value = '';
+      if (jumpPath.length) {
+        selectCell({{ from_row if from_row is not none else 'null' }}, {{ from_col if from_col is not none else 'null' }});
+        jumpPath.forEach(id => document.getElementById(id).classList.add('selected'));
+      } else {
+        document.getElementById('from_row').value = '';
+        document.getElementById('from_col').value = '';
+      }
     }
   </script>
 </head>
@@ -84,6 +97,10 @@ HTML_TEMPLATE = '''
     <select name="agent_mode" onchange="this.form.submit()">
       <option value="neat" {% if agent_mode == 'neat' %}selected{% endif %}>NEAT Only</option>
       <option value="mcts" {% if agent_mode == 'mcts' %}selected{% endif %}>MCTS + NEAT</option>
+      <option value="mcts_root" {% if agent_mode == 'mcts_root' %}selected{% endif %}>MCTS + NEAT (root-parallel)</option>
+      <option value="mcts_tree" {% if agent_mode == 'mcts_tree' %}selected{% endif %}>MCTS + NEAT (tree-parallel)</option>
+      <option value="lookahead" {% if agent_mode == 'lookahead' %}selected{% endif %}>NEAT Value Lookahead</option>
+      <option value="minimax" {% if agent_mode == 'minimax' %}selected{% endif %}>Alpha-Beta Search</option>
     </select>
     <label style="margin-left: 10px;">MCTS Simulations:</label>
     <select name="mcts_simulations" onchange="this.form.submit()">
@@ -91,7 +108,31 @@ HTML_TEMPLATE = '''
         <option value="{{n}}" {% if mcts_simulations == n %}selected{% endif %}>{{n}}</option>
       {% endfor %}
     </select>
-    <span style="margin-left: 10px; color: #888;">Current: {{ agent_mode|capitalize }}{% if agent_mode == 'mcts' %} ({{ mcts_simulations }} sims){% endif %}</span>
+    <label style="margin-left: 10px;">Workers:</label>
+    <select name="mcts_workers" onchange="this.form.submit()">
+      {% for n in [1, 2, 4, 8, 16] if n <= max_workers %}
+        <option value="{{n}}" {% if mcts_workers == n %}selected{% endif %}>{{n}}</option>
+      {% endfor %}
+    </select>
+    <label style="margin-left: 10px;">Selection:</label>
+    <select name="mcts_selection" onchange="this.form.submit()">
+      <option value="ucb" {% if mcts_selection == 'ucb' %}selected{% endif %}>UCB</option>
+      <option value="puct" {% if mcts_selection == 'puct' %}selected{% endif %}>PUCT (policy priors)</option>
+    </select>
+    <label style="margin-left: 10px;">Time per move:</label>
+    <select name="mcts_time_ms" onchange="this.form.submit()">
+      {% for n in [0, 250, 500, 1000, 2000] %}
+        <option value="{{n}}" {% if mcts_time_ms == n %}selected{% endif %}>{{ '%d ms' % n if n else 'Off' }}</option>
+      {% endfor %}
+    </select>
+    <span style="margin-left: 10px; color: #888;">Current: {{ agent_mode|capitalize }}{% if agent_mode.startswith('mcts') %} ({% if mcts_time_ms %}{{ mcts_time_ms }} ms{% else %}{{ mcts_simulations }} sims{% endif %}{% if agent_mode != 'mcts' %}, {{ mcts_workers }} workers{% endif %}){% endif %}</span>
+    {% if search_stats %}
+      {% if search_stats.simulations is defined %}
+        <div style="color: #888;">Last search: {{ search_stats.simulations }} sims in {{ '%.0f' % search_stats.time_ms }} ms ({{ '%.0f' % search_stats.simulations_per_sec }} sims/s), depth {{ search_stats.max_depth }}, stopped by {{ search_stats.stopped }}</div>
+      {% else %}
+        <div style="color: #888;">Last search: depth {{ search_stats.depth }}, {{ search_stats.nodes }} nodes in {{ '%.0f' % search_stats.time_ms }} ms ({{ '%.0f' % search_stats.nodes_per_sec }} nodes/s)</div>
+      {% endif %}
+    {% endif %}
   </form>
 
   <div class="board">
@@ -116,6 +157,7 @@ HTML_TEMPLATE = '''
     <input type="hidden" name="from_row" id="from_row" value="{{ from_row if from_row is not none else '' }}">
     <input type="hidden" name="from_col" id="from_col" value="{{ from_col if from_col is not none else '' }}">
     <input type="hidden" name="to_row" id="to_row" value="">
+    <input type="hidden" name="jump_path" value="{{ jump_path|join(' ') }}">
     <input type="hidden" name="to_col" id="to_col" value="">
     {% if human_turn %}
       <div style="margin: 10px 0; color: #888;">Select your piece, then select a destination square. No need to press submit.</div>
@@ -133,11 +175,38 @@ game = None
 agent1 = None
 agent2 = None
 config = None
-agent_mode = 'neat'  # 'neat' or 'mcts'
+agent_mode = 'neat'  # 'neat', 'mcts', 'mcts_root', 'mcts_tree', 'lookahead' or 'minimax'
 mcts_simulations = 200
+max_workers = os.cpu_count() or 1
+mcts_workers = min(4, max_workers)  # Worker processes for the parallel MCTS modes, 1 to max_workers
+mcts_time_ms = 0  # Time budget per MCTS move; 0 searches mcts_simulations instead
+mcts_selection = 'ucb'  # MCTS child selection: 'ucb' or 'puct'
+
+def landing_path(move):
+    # Squares the moving piece lands on, hop by hop; just the destination for a step
+    if not move[4]:
+        return [(move[2], move[3])]
+    r, c = move[0], move[1]
+    path = []
+    for cr, cc in move[4]:
+        r, c = 2 * cr - r, 2 * cc - c
+        path.append((r, c))
+    return path
+
+def generated_net(genome):
+    # Champion genomes are fixed, so use their generated straight-line network (cached under
+    # analysis/compiled_nets); None falls back to neat's FeedForwardNetwork
+    try:
+        return load_network(genome, config)
+    except (ValueError, OSError) as e:
+        print(f"Warning: Could not generate network for genome {genome.key}: {e}")
+        return None
 
 def setup_agents():
-    global agent1, agent2, config, agent_mode, mcts_simulations
+    global agent1, agent2, config, agent_mode, mcts_simulations, mcts_time_ms, mcts_selection
+    # Stop the worker processes of a parallel MCTS agent being replaced
+    if isinstance(agent2, ParallelMCTSAgent):
+        agent2.close()
     config_path = os.path.join(os.path.dirname(__file__), 'neat_config.txt')
     config = neat.Config(
         neat.DefaultGenome,
@@ -150,84 +219,141 @@ def setup_agents():
     neat_agent = None
     value_agent = None
     try:
-        with open('best_policy_genome.pkl', 'rb') as f:
-            policy_genome = pickle.load(f)
-        neat_agent = NEATAgent(policy_genome, config, player=2)
+        policy_genome = load_genome('best_policy_genome.pkl', config)
+        neat_agent = NEATAgent(policy_genome, config, player=2, net=generated_net(policy_genome))
     except FileNotFoundError:
         try:
-            with open('best_genome.pkl', 'rb') as f:
-                policy_genome = pickle.load(f)
-            neat_agent = NEATAgent(policy_genome, config, player=2)
+            policy_genome = load_genome('best_genome.pkl', config)
+            neat_agent = NEATAgent(policy_genome, config, player=2, net=generated_net(policy_genome))
         except FileNotFoundError:
             print("Warning: Could not load policy NEAT agent. Using RandomAgent instead.")
             neat_agent = RandomAgent(player=2)
+    value_genome = None
     try:
-        with open('best_value_genome.pkl', 'rb') as f:
-            value_genome = pickle.load(f)
-        value_agent = ValueNEATAgent(value_genome, config, player=2)
+        value_genome = load_genome('best_value_genome.pkl', config)
+        value_agent = ValueNEATAgent(value_genome, config, player=2, net=generated_net(value_genome))
     except FileNotFoundError:
         value_agent = None
     agent1 = RandomAgent(player=1)
+    # With a time budget the search runs until the deadline (or until its choice is settled)
+    if mcts_time_ms:
+        search_options = dict(num_simulations=None, max_time_ms=mcts_time_ms)
+    else:
+        search_options = dict(num_simulations=mcts_simulations)
+    search_options['selection'] = mcts_selection
+    # Endgame tablebase from analysis/tablebase.bin (python -m ai.tablebase) and opening book
+    # from analysis/opening_book.bin (python -m ai.opening_book), if they were built
+    stored = dict(tablebase=load_tablebase(), opening_book=load_opening_book())
+    search_options.update(stored)
     if agent_mode == 'mcts':
         if value_agent is not None:
-            agent2 = MCTSAgent(neat_agent, value_agent=value_agent, num_simulations=mcts_simulations, c_param=1.4)
+            agent2 = MCTSAgent(neat_agent, value_agent=value_agent, c_param=1.4, **search_options)
         else:
-            agent2 = MCTSAgent(neat_agent, num_simulations=mcts_simulations, c_param=1.4)
+            agent2 = MCTSAgent(neat_agent, c_param=1.4, **search_options)
+    elif agent_mode in ('mcts_root', 'mcts_tree'):
+        agent2 = ParallelMCTSAgent(neat_agent, value_agent=value_agent, c_param=1.4,
+                                   mode=agent_mode[len('mcts_'):], workers=mcts_workers, **search_options)
+    elif agent_mode == 'lookahead' and value_agent is not None:
+        # Scores with the value agent's networks, the same ones MCTS evaluates with
+        agent2 = ValueLookaheadAgent(value_genome, config, player=2, net=value_agent.net,
+                                     compiled=value_agent.compiled)
+    elif agent_mode == 'minimax':
+        # Deepens until the time per move (1 s when not set) runs out
+        agent2 = MinimaxAgent(player=2, depth=None, max_time_ms=mcts_time_ms or 1000, **stored)
     else:
         agent2 = neat_agent
 
 @app.route('/', methods=['GET', 'POST'])
 def index():
-    global game, agent1, agent2, agent_mode, mcts_simulations
-    # Get agent mode and simulation count from query or form
+    global game, agent1, agent2, agent_mode, mcts_simulations, mcts_workers, mcts_time_ms, mcts_selection
+    settings = (agent_mode, mcts_simulations, mcts_workers, mcts_time_ms, mcts_selection)
+    # A worker count outside 1..max_workers would only fail inside the worker pool; reject it
+    # before any setting changes
+    params = request.form if request.method == 'POST' else request.args
+    if params.get('mcts_workers') is not None:
+        try:
+            workers = int(params.get('mcts_workers'))
+        except (TypeError, ValueError):
+            workers = 0
+        if not 1 <= workers <= max_workers:
+            return f"mcts_workers must be a whole number from 1 to {max_workers}", 400
+        mcts_workers = workers
+    # Get agent mode, simulation count, time budget and selection from query or form
     if request.method == 'POST':
         agent_mode = request.form.get('agent_mode', agent_mode)
         try:
             mcts_simulations = int(request.form.get('mcts_simulations', mcts_simulations))
         except (TypeError, ValueError):
             mcts_simulations = 100
+        try:
+            mcts_time_ms = int(request.form.get('mcts_time_ms', mcts_time_ms))
+        except (TypeError, ValueError):
+            mcts_time_ms = 0
+        mcts_selection = request.form.get('mcts_selection', mcts_selection)
     else:
         agent_mode = request.args.get('agent_mode', agent_mode)
         try:
             mcts_simulations = int(request.args.get('mcts_simulations', mcts_simulations))
         except (TypeError, ValueError):
             mcts_simulations = 100
+        try:
+            mcts_time_ms = int(request.args.get('mcts_time_ms', mcts_time_ms))
+        except (TypeError, ValueError):
+            mcts_time_ms = 0
+        mcts_selection = request.args.get('mcts_selection', mcts_selection)
+    if mcts_selection not in ('ucb', 'puct'):
+        mcts_selection = 'ucb'
 
     if game is None or request.form.get('reset'):
         game = CheckersGame()
         setup_agents()
+    elif settings != (agent_mode, mcts_simulations, mcts_workers, mcts_time_ms, mcts_selection):
+        # A changed dropdown takes effect from agent2's next move of the current game
+        setup_agents()
     status = ""
     human_turn = (game.current_player == 1)
     from_row = request.form.get('from_row')
     from_col = request.form.get('from_col')
     to_row = request.form.get('to_row')
     to_col = request.form.get('to_col')
+    # Landings of a multi-jump chosen so far, as "row-col" cell ids; a jump is played once its
+    # last hop is chosen
+    jump_path = request.form.get('jump_path', '').split() if request.method == 'POST' else []
     move_made = False
 
     if request.method == 'POST' and request.form.get('reset'):
-        game = CheckersGame()
-        setup_agents()
         status = "Game reset. Human's turn."
         human_turn = True
         from_row = from_col = to_row = to_col = None
+        jump_path = []
     elif request.method == 'POST' and human_turn:
         # Human move
         print(f"DEBUG: Human submitted move: from=({from_row},{from_col}) to=({to_row},{to_col})")
         if all(x not in (None, "") for x in [from_row, from_col, to_row, to_col]):
             try:
-                move = (int(from_row), int(from_col), int(to_row), int(to_col))
+                start = (int(from_row), int(from_col))
+                path = [tuple(map(int, cell.split('-'))) for cell in jump_path] + [(int(to_row), int(to_col))]
                 legal_moves = game.get_legal_moves()
                 print(f"DEBUG: Legal moves: {legal_moves}")
-                # Find the full move tuple to pass to game.make_move
-                full_move = next((lm for lm in legal_moves if move == lm[:4]), None)
+                # Moves of the selected piece whose landings begin with the squares chosen so far;
+                # the one landing on exactly those squares is the full move for game.make_move
+                chains = [lm for lm in legal_moves
+                          if tuple(lm[:2]) == start and landing_path(lm)[:len(path)] == path]
+                full_move = next((lm for lm in chains if len(landing_path(lm)) == len(path)), None)
                 if full_move:
                     game.make_move(full_move)
                     move_made = True
                     from_row = from_col = to_row = to_col = None
+                    jump_path = []
+                elif chains:
+                    # Part of a multi-jump: wait for the next hop
+                    jump_path = [f'{r}-{c}' for r, c in path]
+                    to_row = to_col = None
                 else:
                     status = "Invalid move. Try again."
-                    print(f"DEBUG: Invalid move attempted: {move}")
+                    print(f"DEBUG: Invalid move attempted: {start} -> {path}")
                     from_row = from_col = to_row = to_col = None
+                    jump_path = []
             except Exception as e:
                 status = f"Error: {e}"
                 print(f"DEBUG: Error processing move: {e}")
@@ -237,8 +363,8 @@ def index():
         legal_moves = game.get_legal_moves()
         if not legal_moves:
             break
-        # For MCTS agent, pass the game object; for NEAT, pass board/legals
-        if agent_mode == 'mcts' and isinstance(agent2, MCTSAgent):
+        # For search agents, pass the game object; for NEAT, pass board/legals
+        if isinstance(agent2, (MCTSAgent, MinimaxAgent)):
             move = agent2.select_move(game)
         else:
             move = agent2.select_move(game.board.board, legal_moves)
@@ -247,17 +373,41 @@ def index():
         else:
             break
 
-    # Update status
+    # Update status, naming the agent actually playing (a mode can fall back to another agent)
+    if isinstance(agent2, MCTSAgent):
+        agent_name = 'MCTS+NEAT'
+    elif isinstance(agent2, MinimaxAgent):
+        agent_name = 'Alpha-Beta'
+    elif isinstance(agent2, ValueLookaheadAgent):
+        agent_name = 'Value Lookahead'
+    elif isinstance(agent2, RandomAgent):
+        agent_name = 'Random'
+    else:
+        agent_name = 'NEAT'
     if game.is_game_over():
         winner = game.get_winner()
         if winner == 1:
             status = "Human wins!"
         elif winner == 2:
-            status = f"{'MCTS+NEAT' if agent_mode == 'mcts' else 'NEAT'} Agent wins!"
+            status = f"{agent_name} Agent wins!"
         else:
             status = "Draw!"
+    elif jump_path:
+        status = "Keep jumping: select the next landing square."
     else:
-        status = f"{'Human' if game.current_player == 1 else ('MCTS+NEAT' if agent_mode == 'mcts' else 'NEAT Agent')}'s turn"
+        status = f"{'Human' if game.current_player == 1 else agent_name + ' Agent'}'s turn"
+    # Next landing square of every legal move, per piece (only the jumping piece's mid-jump)
+    next_landings = {}
+    if game.current_player == 1 and not game.is_game_over():
+        path = [tuple(map(int, cell.split('-'))) for cell in jump_path]
+        for lm in game.get_legal_moves():
+            landings = landing_path(lm)
+            if jump_path and (lm[:2] != (int(from_row), int(from_col)) or landings[:len(path)] != path):
+                continue
+            r, c = landings[len(path)]
+            cells = next_landings.setdefault(f'{lm[0]}-{lm[1]}', [])
+            if f'{r}-{c}' not in cells:
+                cells.append(f'{r}-{c}')
     board = game.board.board.tolist()
     return render_template_string(
         HTML_TEMPLATE,
@@ -266,8 +416,15 @@ def index():
         human_turn=(game.current_player == 1 and not game.is_game_over()),
         from_row=from_row,
         from_col=from_col,
+        jump_path=jump_path,
+        next_landings=next_landings,
         agent_mode=agent_mode,
-        mcts_simulations=mcts_simulations
+        mcts_simulations=mcts_simulations,
+        mcts_workers=mcts_workers,
+        max_workers=max_workers,
+        mcts_time_ms=mcts_time_ms,
+        mcts_selection=mcts_selection,
+        search_stats=getattr(agent2, 'stats', None)
     )
 
 if __name__ == '__main__':